@@ -1,8 +1,12 @@
 """Agent loading and execution logic."""
 
+import asyncio
 import json
 import logging
-from dataclasses import dataclass
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any, Dict, Optional
 
@@ -10,12 +14,27 @@ import frontmatter
 from claude_agent_sdk import (
     AssistantMessage,
     ClaudeAgentOptions,
+    ResultMessage,
     TextBlock,
+    ToolResultBlock,
     ToolUseBlock,
+    UserMessage,
     query,
 )
 
 from app.config import settings
+from app.limiter import AdaptiveLimiter
+from app.routing import (
+    FALLBACK_REASONS,
+    AgentAPIError,
+    ModelRouter,
+    RouteDecision,
+    RouteRule,
+    classify_error,
+    parse_routes,
+)
+from app.scheduler import Priority, PriorityScheduler
+from app.tracing import Span, current_span, trace_id_for, tracer
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +45,26 @@ def log_event(event: str, **data):
     logger.info(json.dumps(payload, indent=2, ensure_ascii=False))
 
 
+@dataclass
+class RunProgress:
+    """What an in-flight agent run has done so far.
+
+    Filled in by :meth:`AgentExecutor.stream_local` while it streams; the
+    worker pool mirrors updates from worker processes over the pipe.
+    """
+
+    tool_calls: int = 0
+    ttft_ms: Optional[float] = None  # Duration of the first model turn
+
+    def update(self, **changes: Any) -> None:
+        for name, value in changes.items():
+            setattr(self, name, value)
+
+    def reset(self) -> None:
+        """Forget a failed attempt before retrying."""
+        self.update(**asdict(RunProgress()))
+
+
 @dataclass
 class AgentConfig:
     """Configuration loaded from agent.md file."""
@@ -35,6 +74,9 @@ class AgentConfig:
     system_prompt: str
     allowed_tools: list[str]
     description: Optional[str] = None
+    fallback_model: Optional[str] = None
+    timeout_ms: Optional[int] = None
+    routes: list[RouteRule] = field(default_factory=list)
 
     @classmethod
     def from_file(cls, path: Path) -> "AgentConfig":
@@ -70,6 +112,11 @@ class AgentConfig:
             else:
                 allowed_tools = tools if isinstance(tools, list) else []
 
+            # Model routing: ordered rules plus agent-level fallback settings
+            fallback_model = post.metadata.get("fallback_model")
+            timeout_ms = post.metadata.get("timeout_ms")
+            routes = parse_routes(post.metadata.get("routes"), fallback_model, timeout_ms)
+
             # Use the markdown body as system prompt
             system_prompt = post.content.strip()
         else:
@@ -81,6 +128,9 @@ class AgentConfig:
                 "mcp__Datagen__getToolDetails",
                 "mcp__Datagen__executeTool",
             ]
+            fallback_model = None
+            timeout_ms = None
+            routes = []
             system_prompt = content.strip()
 
         return cls(
@@ -89,6 +139,9 @@ class AgentConfig:
             system_prompt=system_prompt,
             allowed_tools=allowed_tools,
             description=description,
+            fallback_model=fallback_model,
+            timeout_ms=timeout_ms,
+            routes=routes,
         )
 
 
@@ -150,10 +203,24 @@ def discover_agent_file() -> Path:
 class AgentExecutor:
     """Execute Claude agent with MCP integration."""
 
-    def __init__(self, agent_config: AgentConfig):
+    def __init__(
+        self,
+        agent_config: AgentConfig,
+        scheduler: Optional[PriorityScheduler] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+    ):
         """Initialize executor with agent configuration."""
         self.config = agent_config
         self.model = settings.model_name or agent_config.model  # Env var overrides
+        self.scheduler = scheduler  # Optional admission control by priority lane
+        self.limiter = limiter  # Optional adaptive tuning of the scheduler's limit
+        self.router = ModelRouter(
+            agent_config.routes,
+            default_model=self.model,
+            fallback_model=agent_config.fallback_model,
+            timeout_ms=agent_config.timeout_ms,
+        )
+        self.pool = None  # Optional WorkerPool, attached at app startup
 
     def build_mcp_config(self) -> Dict[str, Any]:
         """Build MCP server configuration from environment."""
@@ -180,27 +247,84 @@ class AgentExecutor:
 
         return mcp_servers
 
-    def _build_options(self) -> ClaudeAgentOptions:
+    def _build_options(self, model: Optional[str] = None) -> ClaudeAgentOptions:
         """Compose Claude agent options."""
 
         return ClaudeAgentOptions(
-            model=self.model,
+            model=model or self.model,
             system_prompt=self.config.system_prompt,
             permission_mode=settings.permission_mode,
             mcp_servers=self.build_mcp_config(),
             allowed_tools=self.config.allowed_tools if self.config.allowed_tools else None,
         )
 
-    async def stream_execute(self, payload: Dict[str, Any], request_id: str, *, log_success: bool = True):
-        """Async generator yielding text chunks for streaming responses."""
-
-        log_event("agent_start", request_id=request_id, agent=self.config.name)
-        user_message = self._format_payload(payload)
-        opts = self._build_options()
+    async def stream_local(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        parent: Optional[Span] = None,
+        model: Optional[str] = None,
+        progress: Optional[RunProgress] = None,
+        first_turn_timeout: Optional[float] = None,
+    ):
+        """Async generator running the agent in this process and yielding text chunks.
+
+        Records spans for payload formatting, option building, SDK startup,
+        each model turn and each tool round trip under ``parent``. Tool calls
+        and the first turn's duration (time to first token, excluding CLI
+        startup) are reported on ``progress``. Raises ``TimeoutError`` if the
+        model has not answered within ``first_turn_timeout`` seconds, and
+        :class:`AgentAPIError` when the CLI reports an API error or an error
+        result (which it does in-band, as message content).
+        """
+        progress = progress or RunProgress()
+
+        query_span = tracer.start_span(
+            "agent.query",
+            parent,
+            trace_id=trace_id_for(request_id),
+            model=model or self.model,
+            pid=os.getpid(),
+        )
+        with tracer.span("payload.format", query_span):
+            user_message = self._format_payload(payload)
+        with tracer.span("options.build", query_span):
+            opts = self._build_options(model)
+
+        startup_span = tracer.start_span("sdk.startup", query_span)
+        tool_spans: Dict[str, Span] = {}
+        waiting_since = time.time_ns()
+        turns = 0
+        error: Optional[BaseException] = None
+        messages = query(prompt=user_message, options=opts)
+        deadline = time.monotonic() + first_turn_timeout if first_turn_timeout else None
 
         try:
-            async for msg in query(prompt=user_message, options=opts):
+            while True:
+                timeout = max(deadline - time.monotonic(), 0.0) if deadline and not turns else None
+                try:
+                    msg = await asyncio.wait_for(messages.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No model response within {first_turn_timeout:g}s") from None
+                now = time.time_ns()
+                tracer.end_span(startup_span, end_ns=now)
+
                 if isinstance(msg, AssistantMessage):
+                    turns += 1
+                    turn_span = tracer.start_span(
+                        "model.turn", query_span, start_ns=waiting_since, turn=turns, blocks=len(msg.content)
+                    )
+                    tracer.end_span(turn_span, end_ns=now)
+                    if msg.error:
+                        # The API's error text must not reach the client as output
+                        text = "".join(b.text for b in msg.content if isinstance(b, TextBlock))
+                        raise AgentAPIError(msg.error, text)
+                    if turns == 1:
+                        progress.update(ttft_ms=(now - waiting_since) / 1_000_000)
+                    waiting_since = now
+
                     for block in msg.content:
                         if isinstance(block, TextBlock):
                             text = block.text
@@ -218,27 +342,236 @@ class AgentExecutor:
                                 tool=block.name,
                                 input=block.input,
                             )
+                            tool_spans[block.id] = tracer.start_span(
+                                "tool.call", query_span, start_ns=now, tool=block.name, tool_use_id=block.id
+                            )
+                            progress.update(tool_calls=progress.tool_calls + 1)
                 else:
-            log_event("agent_event", request_id=request_id, msg_type=type(msg).__name__)
-
-        except Exception as e:
+                    if isinstance(msg, UserMessage) and isinstance(msg.content, list):
+                        for block in msg.content:
+                            if isinstance(block, ToolResultBlock) and block.tool_use_id in tool_spans:
+                                tool_span = tool_spans.pop(block.tool_use_id)
+                                tool_span.set(is_error=bool(block.is_error))
+                                tracer.end_span(tool_span, end_ns=now)
+                    elif isinstance(msg, ResultMessage):
+                        query_span.set(
+                            num_turns=msg.num_turns,
+                            duration_api_ms=msg.duration_api_ms,
+                            total_cost_usd=msg.total_cost_usd,
+                            is_error=msg.is_error,
+                        )
+                        if msg.is_error:
+                            raise AgentAPIError(msg.subtype, msg.result or "; ".join(msg.errors or []))
+                    log_event("agent_event", request_id=request_id, msg_type=type(msg).__name__)
+                    waiting_since = now
+
+        except (Exception, asyncio.CancelledError) as e:
+            error = e
+            raise
+        finally:
+            await messages.aclose()
+            for tool_span in tool_spans.values():
+                tool_span.set(completed=False)
+                tracer.end_span(tool_span)
+            tracer.end_span(startup_span)
+            tracer.end_span(query_span, error=error)
+
+    @asynccontextmanager
+    async def _admit(self, priority: Priority, request_id: str):
+        """Hold a scheduler slot in the ``priority`` lane, if a scheduler is attached."""
+        if self.scheduler is None:
+            yield
+            return
+
+        async with self.scheduler.slot(priority) as ticket:
             log_event(
-                "agent_error",
+                "agent_scheduled",
                 request_id=request_id,
-                error=str(e),
-                error_type=type(e).__name__,
+                lane=ticket.lane,
+                wait_ms=round(ticket.wait_ms, 1),
+            )
+            yield
+
+    def _record_outcome(
+        self,
+        request_id: str,
+        model: str,
+        *,
+        ttft_ms: Optional[float] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Feed an attempt's outcome on ``model`` to the adaptive limiter and log any limit change."""
+        if self.limiter is None:
+            return
+        adjustment = self.limiter.record(ttft_ms=ttft_ms, error=error, model=model)
+        if adjustment:
+            log_event("concurrency_limit_changed", request_id=request_id, **adjustment)
+
+    def select_route(
+        self,
+        payload: Dict[str, Any],
+        *,
+        latency_budget_ms: Optional[int] = None,
+        client: Optional[str] = None,
+    ) -> RouteDecision:
+        """Choose the model for a run from the agent's routing rules."""
+        payload_bytes = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        return self.router.route(payload_bytes, latency_budget_ms=latency_budget_ms, client=client)
+
+    async def _stream_routed(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        route: RouteDecision,
+        parent: Span,
+        progress: RunProgress,
+    ):
+        """Run on the routed model, retrying once on the fallback model.
+
+        Falls back when the model does not answer within ``route.timeout_ms``
+        or the attempt fails with an overload error. Attempts that have
+        streamed text or called a tool are never retried, since a retry
+        would repeat their output or side effects; their errors are raised
+        as-is. ``progress`` describes the last attempt only. Each attempt's
+        outcome is fed to the adaptive limiter under the model it ran on.
+        """
+        model = route.model
+        while True:
+            progress.reset()
+            first_turn_timeout = route.timeout_ms / 1000 if route.timeout_ms and model == route.model else None
+            source = self.pool.stream if self.pool is not None else self.stream_local
+            chunks = source(
+                payload,
+                request_id,
+                parent=parent,
+                model=model,
+                progress=progress,
+                first_turn_timeout=first_turn_timeout,
             )
-            raise
-        finally:
-            if log_success:
-                # result length is calculated by caller when buffering; keep None for streaming
-                log_event("agent_success", request_id=request_id, result_length=None)
 
-    async def execute(self, payload: Dict[str, Any], request_id: str) -> str:
+            streamed = False
+            try:
+                async for chunk in chunks:
+                    streamed = True
+                    yield chunk
+                self._record_outcome(request_id, model, ttft_ms=progress.ttft_ms)
+                return
+            except Exception as e:
+                reason = classify_error(e)
+                self._record_outcome(request_id, model, error=reason)
+                fallback = route.fallback_model
+                if (
+                    streamed
+                    or progress.tool_calls
+                    or reason not in FALLBACK_REASONS
+                    or not fallback
+                    or model == fallback
+                ):
+                    raise
+                log_event(
+                    "agent_fallback",
+                    request_id=request_id,
+                    from_model=model,
+                    to_model=fallback,
+                    reason=reason,
+                    error=str(e),
+                )
+                parent.set(fallback_model=fallback, fallback_reason=reason)
+                model = fallback
+            finally:
+                await chunks.aclose()
+
+    async def stream_execute(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        *,
+        priority: Priority = "high",
+        latency_budget_ms: Optional[int] = None,
+        client: Optional[str] = None,
+        log_success: bool = True,
+    ):
+        """Async generator yielding text chunks for streaming responses.
+
+        Picks a model from the routing rules, waits for a slot in the
+        ``priority`` lane, then runs on the worker pool when one is attached,
+        otherwise in this process.
+        """
+
+        route = self.select_route(payload, latency_budget_ms=latency_budget_ms, client=client)
+        run_span = tracer.start_span(
+            "agent.run",
+            current_span(),
+            trace_id=trace_id_for(request_id),
+            agent=self.config.name,
+            model=route.model,
+            route=route.name,
+            route_reason=route.reason,
+            priority=priority,
+        )
+        log_event(
+            "agent_route",
+            request_id=request_id,
+            route=route.name,
+            model=route.model,
+            reason=route.reason,
+            fallback_model=route.fallback_model,
+            client=client,
+        )
+        wait_span = tracer.start_span("scheduler.wait", run_span)
+        error: Optional[Exception] = None
+
+        try:
+            async with self._admit(priority, request_id):
+                tracer.end_span(wait_span)
+                log_event("agent_start", request_id=request_id, agent=self.config.name)
+
+                progress = RunProgress()
+                chunks = self._stream_routed(payload, request_id, route, run_span, progress)
+                try:
+                    async for chunk in chunks:
+                        yield chunk
+
+                except Exception as e:
+                    error = e
+                    log_event(
+                        "agent_error",
+                        request_id=request_id,
+                        error=str(e),
+                        error_type=type(e).__name__,
+                    )
+                    raise
+                finally:
+                    await chunks.aclose()
+                    if progress.ttft_ms is not None:
+                        run_span.set(ttft_ms=round(progress.ttft_ms, 1))
+                    if log_success:
+                        # result length is calculated by caller when buffering; keep None for streaming
+                        log_event("agent_success", request_id=request_id, result_length=None)
+        finally:
+            tracer.end_span(wait_span)
+            tracer.end_span(run_span, error=error)
+
+    async def execute(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        *,
+        priority: Priority = "high",
+        latency_budget_ms: Optional[int] = None,
+        client: Optional[str] = None,
+    ) -> str:
         """Execute agent and return concatenated text (non-streaming)."""
 
         collected_text: list[str] = []
-        async for chunk in self.stream_execute(payload, request_id, log_success=False):
+        async for chunk in self.stream_execute(
+            payload,
+            request_id,
+            priority=priority,
+            latency_budget_ms=latency_budget_ms,
+            client=client,
+            log_success=False,
+        ):
             collected_text.append(chunk)
 
         result = "".join(collected_text)
@@ -259,7 +592,12 @@ Process this data according to your system prompt instructions."""
 # Load agent configuration at module import (once at startup)
 _agent_file = discover_agent_file()
 _agent_config = AgentConfig.from_file(_agent_file)
-agent_executor = AgentExecutor(_agent_config)
+_scheduler = PriorityScheduler.from_settings()
+agent_executor = AgentExecutor(
+    _agent_config,
+    scheduler=_scheduler,
+    limiter=AdaptiveLimiter.from_settings(_scheduler) if settings.adaptive_concurrency else None,
+)
 
 log_event(
     "agent_loaded",
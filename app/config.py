@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -40,6 +40,11 @@ class Settings(BaseSettings):
     webhook_secret: Optional[str] = Field(
         default=None, description="API key for webhook authentication"
     )
+    client_api_keys: Optional[str] = Field(
+        default=None,
+        description="Comma-separated per-client API keys as 'name:key' (e.g. 'acme:k1,beta:k2'); "
+        "the client name is what agent.md routes match on",
+    )
 
     # Model configuration (optional)
     model_name: str = Field(
@@ -55,6 +60,91 @@ class Settings(BaseSettings):
         description="Agent SDK permission mode (safe with non-root Docker user)",
     )
 
+    # Worker pool (optional)
+    worker_pool_size: int = Field(
+        default=0,
+        ge=0,
+        description="Number of pre-started executor worker processes (0 runs agents in the API process)",
+    )
+    worker_max_runs: int = Field(
+        default=50,
+        ge=0,
+        description="Agent runs a worker handles before it is recycled (0 disables recycling)",
+    )
+    worker_memory_limit_mb: int = Field(
+        default=0,
+        ge=0,
+        description="Address-space limit per worker process in MB (0 disables the limit)",
+    )
+    worker_cpu_limit_seconds: int = Field(
+        default=0,
+        ge=0,
+        description="CPU-time limit per worker process lifetime in seconds (0 disables the limit)",
+    )
+    worker_base_dir: Optional[Path] = Field(
+        default=None,
+        description="Parent directory for per-worker working directories (defaults to the system temp dir)",
+    )
+    worker_acquire_timeout_seconds: float = Field(
+        default=60.0,
+        gt=0,
+        description="Seconds a run waits for an idle worker before failing",
+    )
+
+    # Scheduling (optional)
+    max_concurrent_runs: int = Field(
+        default=0,
+        ge=0,
+        description="Concurrent agent runs across all lanes (0 uses WORKER_POOL_SIZE, or 8 without a pool)",
+    )
+    interactive_reserved_runs: int = Field(
+        default=1,
+        ge=0,
+        description="Run slots background (/run) work may never occupy",
+    )
+    priority_aging_seconds: float = Field(
+        default=30.0,
+        ge=0,
+        description="Queued seconds after which a waiting run is promoted one lane (0 disables aging)",
+    )
+
+    adaptive_concurrency: bool = Field(
+        default=True,
+        description="Tune the concurrent run limit from time-to-first-token and rate-limit/overload/timeout errors",
+    )
+    adaptive_min_concurrent_runs: int = Field(
+        default=1, ge=1, description="Lowest limit adaptive concurrency may set"
+    )
+    adaptive_max_concurrent_runs: int = Field(
+        default=0,
+        ge=0,
+        description="Highest limit adaptive concurrency may set (0 uses MAX_CONCURRENT_RUNS, "
+        "else WORKER_POOL_SIZE, else 32); never above MAX_CONCURRENT_RUNS or WORKER_POOL_SIZE",
+    )
+    adaptive_latency_tolerance: float = Field(
+        default=2.0,
+        gt=1.0,
+        description="Back off when recent time-to-first-token exceeds this multiple of the baseline",
+    )
+
+    # Tracing (optional)
+    tracing_enabled: bool = Field(
+        default=True, description="Record per-run span timelines (served at /runs/{id}/trace)"
+    )
+    trace_buffer_size: int = Field(
+        default=500, ge=1, description="Number of recent traces kept in memory"
+    )
+    trace_file: Optional[Path] = Field(
+        default=None, description="Append finished spans to this file as OTLP/JSON lines"
+    )
+    trace_otlp_endpoint: Optional[str] = Field(
+        default=None,
+        description="OTLP/HTTP traces URL to POST spans to (e.g. 'http://localhost:4318/v1/traces')",
+    )
+    trace_service_name: str = Field(
+        default="agent-api", description="service.name resource attribute on exported spans"
+    )
+
     # CORS settings (optional)
     cors_enabled: bool = Field(
         default=False, description="Enable CORS middleware for frontend integrations"
@@ -73,7 +163,26 @@ class Settings(BaseSettings):
             )
         return v.strip()
 
-    @field_validator("agent_file_path")
+    @field_validator("client_api_keys")
+    @classmethod
+    def validate_client_api_keys(cls, v: Optional[str]) -> Optional[str]:
+        """Ensure every entry is a non-empty 'name:key' pair."""
+        if v is None:
+            return None
+        for entry in v.split(","):
+            name, _, key = entry.strip().partition(":")
+            if not name.strip() or not key.strip():
+                raise ValueError("CLIENT_API_KEYS entries must look like 'name:key'")
+        return v
+
+    def client_keys(self) -> Dict[str, str]:
+        """Map each client API key to its client name."""
+        if not self.client_api_keys:
+            return {}
+        pairs = (entry.strip().partition(":") for entry in self.client_api_keys.split(","))
+        return {key.strip(): name.strip() for name, _, key in pairs}
+
+    @field_validator("agent_file_path", "trace_file")
     @classmethod
     def validate_agent_path(cls, v: Optional[Path]) -> Optional[Path]:
         """Convert string to Path if needed."""
@@ -0,0 +1,170 @@
+"""Adaptive concurrency limit for agent runs (AIMD with a latency gradient).
+
+The limiter tunes :class:`PriorityScheduler`'s concurrency cap from what each
+run observes upstream:
+
+- Rate-limit and overload errors, and runs whose model did not answer within
+  the route's timeout, cut the limit multiplicatively.
+- A short-term time-to-first-token (TTFT) average rising well above the
+  long-term baseline is treated as queueing upstream and also cuts the limit.
+  Baselines are kept per model, since routing mixes models with very
+  different TTFTs and a shift in traffic mix is not upstream queueing.
+- Otherwise, while demand fills the current limit, every successful run
+  grows it additively by ``1 / limit`` (about +1 per limit's worth of runs).
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+
+from app.config import settings
+from app.scheduler import PriorityScheduler
+
+BACKOFF_ERRORS = ("rate_limited", "overloaded", "timeout")
+
+
+@dataclass
+class _LatencyEstimate:
+    """Short- and long-term TTFT averages for one model."""
+
+    baseline_ttft_ms: float
+    recent_ttft_ms: float
+    samples: int = 1
+
+
+class AdaptiveLimiter:
+    """Grow and shrink the scheduler's concurrency limit from run outcomes."""
+
+    def __init__(
+        self,
+        scheduler: PriorityScheduler,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.75,
+        cooldown_seconds: float = 5.0,
+        baseline_alpha: float = 0.02,
+        recent_alpha: float = 0.2,
+        history_size: int = 50,
+    ):
+        self.scheduler = scheduler
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.cooldown_seconds = cooldown_seconds
+        self.baseline_alpha = baseline_alpha
+        self.recent_alpha = recent_alpha
+
+        self.limit = float(min(max(scheduler.max_concurrency, self.min_limit), self.max_limit))
+        self.latency: Dict[str, _LatencyEstimate] = {}
+        self.samples = 0
+        self.errors: Dict[str, int] = {kind: 0 for kind in BACKOFF_ERRORS}
+        self.adjustments: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._last_decrease = 0.0
+        self.scheduler.set_limit(int(self.limit))
+
+    @classmethod
+    def from_settings(cls, scheduler: PriorityScheduler) -> "AdaptiveLimiter":
+        # MAX_CONCURRENT_RUNS (else the worker pool size) is a hard cap; adaptation never exceeds it
+        cap = settings.max_concurrent_runs or settings.worker_pool_size
+        max_limit = settings.adaptive_max_concurrent_runs or cap or 32
+        if cap:
+            max_limit = min(max_limit, cap)
+        return cls(
+            scheduler,
+            min_limit=settings.adaptive_min_concurrent_runs,
+            max_limit=max_limit,
+            latency_tolerance=settings.adaptive_latency_tolerance,
+        )
+
+    def _set_limit(self, limit: float, reason: str, model: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Apply a new limit; return the adjustment if the whole-number limit changed."""
+        old = int(self.limit)
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        new = int(self.limit)
+        if new == old:
+            return None
+
+        self.scheduler.set_limit(new)
+        estimate = self.latency.get(model) if model else None
+        adjustment = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "from_limit": old,
+            "to_limit": new,
+            "reason": reason,
+            "model": model,
+            "recent_ttft_ms": _round(estimate.recent_ttft_ms) if estimate else None,
+            "baseline_ttft_ms": _round(estimate.baseline_ttft_ms) if estimate else None,
+        }
+        self.adjustments.append(adjustment)
+        return adjustment
+
+    def _decrease(self, reason: str, model: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Back off, at most once per cooldown so one error wave counts once."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_seconds:
+            return None
+        self._last_decrease = now
+        return self._set_limit(self.limit * self.backoff_ratio, reason, model)
+
+    def record(
+        self,
+        ttft_ms: Optional[float] = None,
+        error: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Feed one run outcome on ``model``: its time to first token and/or its error kind.
+
+        Returns the limit adjustment it caused, if any.
+        """
+        if error in BACKOFF_ERRORS:
+            self.errors[error] += 1
+            return self._decrease(error, model)
+        if ttft_ms is None:
+            return None
+
+        self.samples += 1
+        key = model or "default"
+        estimate = self.latency.get(key)
+        if estimate is None:
+            estimate = self.latency[key] = _LatencyEstimate(ttft_ms, ttft_ms)
+        else:
+            estimate.samples += 1
+            estimate.recent_ttft_ms += self.recent_alpha * (ttft_ms - estimate.recent_ttft_ms)
+            estimate.baseline_ttft_ms += self.baseline_alpha * (ttft_ms - estimate.baseline_ttft_ms)
+
+        if estimate.recent_ttft_ms > estimate.baseline_ttft_ms * self.latency_tolerance:
+            return self._decrease("latency", key)
+
+        # Only grow while the limit is actually binding
+        if self.scheduler.queued or self.scheduler.in_flight >= int(self.limit):
+            return self._set_limit(self.limit + 1 / self.limit, "increase", key)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limit, per-model latency estimates, backoff error counts and recent adjustments."""
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.scheduler.in_flight,
+            "queued": self.scheduler.queued,
+            "samples": self.samples,
+            "models": {
+                model: {
+                    "samples": estimate.samples,
+                    "baseline_ttft_ms": _round(estimate.baseline_ttft_ms),
+                    "recent_ttft_ms": _round(estimate.recent_ttft_ms),
+                }
+                for model, estimate in self.latency.items()
+            },
+            "errors": dict(self.errors),
+            "adjustments": list(self.adjustments),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
@@ -1,16 +1,28 @@
 """FastAPI application entry point."""
 
+import hmac
 import logging
 import uuid
 from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal, Optional
 
 from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 from app.agent import agent_executor, log_event
 from app.config import settings
-from app.models import AgentMetadata, HealthResponse, RunRequest, RunResponse
+from app.models import (
+    AgentMetadata,
+    ConcurrencyStats,
+    HealthResponse,
+    RunRequest,
+    RunResponse,
+    SchedulerStats,
+    TraceResponse,
+)
+from app.tracing import Span, render_timeline, timeline, trace_id_for, tracer, use_span
+from app.workers import WorkerLimits, WorkerPool
 
 # Configure logging
 logging.basicConfig(
@@ -19,12 +31,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Endpoints that start agent runs and get an http.request trace
+TRACED_PATHS = frozenset({"/run", "/run/sync", "/run/stream"})
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     log_event("app_startup", agent=agent_executor.config.name, model=agent_executor.model)
+
+    # Run agents on pre-started worker processes instead of the API process
+    if settings.worker_pool_size:
+        pool = WorkerPool(
+            agent_executor,
+            size=settings.worker_pool_size,
+            limits=WorkerLimits.from_settings(),
+            base_dir=settings.worker_base_dir,
+            acquire_timeout=settings.worker_acquire_timeout_seconds,
+        )
+        await pool.start()
+        agent_executor.pool = pool
+
     yield
+
+    if agent_executor.pool is not None:
+        await agent_executor.pool.stop()
+        agent_executor.pool = None
+    tracer.shutdown()
     log_event("app_shutdown")
 
 
@@ -48,6 +81,23 @@ if settings.cors_enabled:
     log_event("cors_enabled", origins=origins)
 
 
+async def _traced_body(body: AsyncIterator[bytes], span: Span, request: Request) -> AsyncIterator[bytes]:
+    """Pass a response body through and end ``span`` once it has been sent.
+
+    Streaming endpoints report failures in-band (an SSE ``error`` event) and
+    leave them on ``request.state.stream_error`` for the span.
+    """
+    error: Optional[BaseException] = None
+    try:
+        async for chunk in body:
+            yield chunk
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        tracer.end_span(span, error=error or getattr(request.state, "stream_error", None))
+
+
 # Middleware: Request ID injection
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
@@ -64,7 +114,25 @@ async def add_request_id(request: Request, call_next):
         client=request.client.host if request.client else None,
     )
 
-    response = await call_next(request)
+    # Only agent runs are traced; health checks and stats polling would flush runs out of the buffer
+    if request.url.path in TRACED_PATHS:
+        span = tracer.start_span(
+            "http.request",
+            trace_id=trace_id_for(request_id),
+            method=request.method,
+            path=request.url.path,
+        )
+        try:
+            with use_span(span):
+                response = await call_next(request)
+        except BaseException as e:
+            tracer.end_span(span, error=e)
+            raise
+        span.set(status_code=response.status_code)
+        # call_next returns once headers are sent; the span covers the whole body
+        response.body_iterator = _traced_body(response.body_iterator, span, request)
+    else:
+        response = await call_next(request)
 
     # Log response
     log_event(
@@ -102,15 +170,18 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 
 # Dependency: API key verification
-async def verify_api_key(x_api_key: str | None = Header(None, alias="X-API-Key")):
-    """Verify API key from request header.
+async def verify_api_key(x_api_key: str | None = Header(None, alias="X-API-Key")) -> str | None:
+    """Verify API key from request header and return the client it belongs to.
 
-    If WEBHOOK_SECRET is not set, authentication is optional (for development).
-    In production, always set WEBHOOK_SECRET.
+    Keys listed in CLIENT_API_KEYS authenticate as their named client, which
+    model routes can match on; WEBHOOK_SECRET authenticates without a client
+    name. If neither is set, authentication is optional (for development) and
+    no client is identified. In production, always set one of them.
     """
-    if not settings.webhook_secret:
+    client_keys = settings.client_keys()
+    if not settings.webhook_secret and not client_keys:
         # No secret configured - allow unauthenticated access
-        return
+        return None
 
     if x_api_key is None:
         raise HTTPException(
@@ -118,15 +189,32 @@ async def verify_api_key(x_api_key: str | None = Header(None, alias="X-API-Key")
             detail="API key required. Provide X-API-Key header.",
         )
 
-    if x_api_key != settings.webhook_secret:
-        raise HTTPException(status_code=401, detail="Invalid API key")
+    for key, client in client_keys.items():
+        if hmac.compare_digest(x_api_key.encode(), key.encode()):
+            return client
+    if settings.webhook_secret and hmac.compare_digest(x_api_key.encode(), settings.webhook_secret.encode()):
+        return None
+
+    raise HTTPException(status_code=401, detail="Invalid API key")
 
 
 # Background task: Agent execution
-async def run_agent_task(payload: dict, request_id: str):
+async def run_agent_task(
+    payload: dict,
+    request_id: str,
+    priority: str = "low",
+    latency_budget_ms: int | None = None,
+    client: str | None = None,
+):
     """Execute agent in background."""
     try:
-        await agent_executor.execute(payload, request_id)
+        await agent_executor.execute(
+            payload,
+            request_id,
+            priority=priority,
+            latency_budget_ms=latency_budget_ms,
+            client=client,
+        )
     except Exception as e:
         log_event(
             "background_task_error",
@@ -142,7 +230,7 @@ async def run_agent(
     request: RunRequest,
     background_tasks: BackgroundTasks,
     req: Request,
-    _: None = Depends(verify_api_key),
+    client: str | None = Depends(verify_api_key),
 ):
     """Execute agent with JSON payload.
 
@@ -152,16 +240,25 @@ async def run_agent(
     Requires X-API-Key header if WEBHOOK_SECRET is set in environment.
     """
     request_id = req.state.request_id
+    priority = request.priority or "low"
 
     log_event(
         "agent_queued",
         request_id=request_id,
         agent=agent_executor.config.name,
+        priority=priority,
         payload_keys=list(request.payload.keys()),
     )
 
     # Queue background task
-    background_tasks.add_task(run_agent_task, request.payload, request_id)
+    background_tasks.add_task(
+        run_agent_task,
+        request.payload,
+        request_id,
+        priority,
+        request.latency_budget_ms,
+        client,
+    )
 
     return RunResponse(
         status="queued",
@@ -174,13 +271,19 @@ async def run_agent(
 async def run_agent_sync(
     request: RunRequest,
     req: Request,
-    _: None = Depends(verify_api_key),
+    client: str | None = Depends(verify_api_key),
 ):
     """Execute agent synchronously and return the full result."""
 
     request_id = req.state.request_id
     try:
-        result = await agent_executor.execute(request.payload, request_id)
+        result = await agent_executor.execute(
+            request.payload,
+            request_id,
+            priority=request.priority or "high",
+            latency_budget_ms=request.latency_budget_ms,
+            client=client,
+        )
         return RunResponse(
             status="completed",
             request_id=request_id,
@@ -201,7 +304,7 @@ async def run_agent_sync(
 async def run_agent_stream(
     request: RunRequest,
     req: Request,
-    _: None = Depends(verify_api_key),
+    client: str | None = Depends(verify_api_key),
 ):
     """Execute agent and stream the result as server-sent events (SSE)."""
 
@@ -209,10 +312,17 @@ async def run_agent_stream(
 
     async def event_generator():
         try:
-            async for chunk in agent_executor.stream_execute(request.payload, request_id):
+            async for chunk in agent_executor.stream_execute(
+                request.payload,
+                request_id,
+                priority=request.priority or "high",
+                latency_budget_ms=request.latency_budget_ms,
+                client=client,
+            ):
                 yield f"data: {chunk}\n\n"
             yield "event: done\ndata: [DONE]\n\n"
         except Exception as e:
+            req.state.stream_error = e
             log_event(
                 "agent_stream_error",
                 request_id=request_id,
@@ -263,6 +373,48 @@ def get_agent_metadata():
     )
 
 
+@app.get("/scheduler", response_model=SchedulerStats)
+def get_scheduler_stats():
+    """Get per-lane queue depth and wait-time stats from the priority scheduler."""
+    if agent_executor.scheduler is None:
+        raise HTTPException(status_code=404, detail="Scheduler is not enabled")
+    return SchedulerStats(**agent_executor.scheduler.stats())
+
+
+@app.get("/concurrency", response_model=ConcurrencyStats)
+def get_concurrency_stats():
+    """Get the adaptive concurrency limit and its recent adjustments."""
+    if agent_executor.limiter is None:
+        raise HTTPException(status_code=404, detail="Adaptive concurrency is not enabled")
+    return ConcurrencyStats(**agent_executor.limiter.stats())
+
+
+@app.get("/runs/{request_id}/trace", response_model=TraceResponse)
+def get_run_trace(
+    request_id: str,
+    format: Literal["json", "text"] = "json",
+    _: str | None = Depends(verify_api_key),
+):
+    """Get the span timeline recorded for a run.
+
+    Use ``?format=text`` for a plain-text waterfall chart.
+    """
+    spans = tracer.get_trace(trace_id_for(request_id))
+    if not spans:
+        raise HTTPException(status_code=404, detail="No trace recorded for this request ID")
+
+    rows = timeline(spans)
+    if format == "text":
+        return PlainTextResponse(render_timeline(rows))
+
+    return TraceResponse(
+        request_id=request_id,
+        trace_id=spans[0].trace_id,
+        duration_ms=round(max(r["start_offset_ms"] + r["duration_ms"] for r in rows), 2),
+        spans=rows,
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
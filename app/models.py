@@ -16,6 +16,15 @@ class RunRequest(BaseModel):
             {"text": "Hello world", "action": "analyze"},
         ],
     )
+    priority: Optional[Literal["high", "normal", "low"]] = Field(
+        default=None,
+        description="Scheduling lane (defaults to 'high' for /run/sync and /run/stream, 'low' for /run)",
+    )
+    latency_budget_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Latency hint used by agent.md routing rules to pick a faster model",
+    )
 
 
 class RunResponse(BaseModel):
@@ -49,3 +58,88 @@ class AgentMetadata(BaseModel):
     description: Optional[str] = Field(default=None, description="Agent description")
     tools: list[str] = Field(default_factory=list, description="Allowed tools")
     model: str = Field(..., description="Claude model")
+
+
+class LaneStats(BaseModel):
+    """Queue and wait-time stats for one scheduling lane."""
+
+    queued: int = Field(..., description="Runs currently waiting for a slot")
+    running: int = Field(..., description="Runs currently executing")
+    started: int = Field(..., description="Runs admitted since startup")
+    completed: int = Field(..., description="Runs finished since startup")
+    wait_ms_avg: float = Field(..., description="Mean queue wait over recent runs")
+    wait_ms_p50: float = Field(..., description="Median queue wait over recent runs")
+    wait_ms_p95: float = Field(..., description="95th percentile queue wait over recent runs")
+    wait_ms_max: float = Field(..., description="Longest queue wait since startup")
+
+
+class SchedulerStats(BaseModel):
+    """Priority scheduler state."""
+
+    max_concurrency: int = Field(..., description="Concurrent runs allowed across all lanes")
+    reserved_interactive: int = Field(..., description="Slots background runs may not occupy")
+    aging_seconds: float = Field(..., description="Queued seconds per one-lane promotion")
+    in_flight: int = Field(..., description="Runs currently executing")
+    lanes: Dict[str, LaneStats] = Field(..., description="Per-lane stats keyed by priority")
+
+
+class TraceSpan(BaseModel):
+    """One span in a run's timeline."""
+
+    name: str = Field(..., description="Operation name (e.g. 'model.turn', 'tool.call')")
+    span_id: str = Field(..., description="Span identifier")
+    parent_id: Optional[str] = Field(default=None, description="Parent span identifier")
+    depth: int = Field(..., description="Nesting depth in the timeline")
+    start_offset_ms: float = Field(..., description="Start time relative to the trace start")
+    duration_ms: float = Field(..., description="Span duration")
+    error: Optional[str] = Field(default=None, description="Error that ended the span, if any")
+    attributes: Dict[str, Any] = Field(default_factory=dict, description="Span attributes")
+
+
+class TraceResponse(BaseModel):
+    """Span timeline for a single run."""
+
+    request_id: str = Field(..., description="Request identifier")
+    trace_id: str = Field(..., description="Trace identifier (request ID without dashes)")
+    duration_ms: float = Field(..., description="Time from the first span start to the last span end")
+    spans: list[TraceSpan] = Field(..., description="Spans in depth-first, start-time order")
+
+
+class LimitAdjustment(BaseModel):
+    """One change of the adaptive concurrency limit."""
+
+    at: str = Field(..., description="UTC timestamp of the change")
+    from_limit: int = Field(..., description="Limit before the change")
+    to_limit: int = Field(..., description="Limit after the change")
+    reason: Literal["increase", "latency", "rate_limited", "overloaded", "timeout"] = Field(
+        ..., description="Signal that triggered the change"
+    )
+    model: Optional[str] = Field(default=None, description="Model of the run that triggered the change")
+    recent_ttft_ms: Optional[float] = Field(
+        default=None, description="Recent time-to-first-token average for that model"
+    )
+    baseline_ttft_ms: Optional[float] = Field(
+        default=None, description="Long-term time-to-first-token baseline for that model"
+    )
+
+
+class ModelLatency(BaseModel):
+    """Time-to-first-token estimates for one model."""
+
+    samples: int = Field(..., description="Time-to-first-token samples observed")
+    baseline_ttft_ms: float = Field(..., description="Long-term time-to-first-token baseline")
+    recent_ttft_ms: float = Field(..., description="Recent time-to-first-token average")
+
+
+class ConcurrencyStats(BaseModel):
+    """Adaptive concurrency limiter state."""
+
+    limit: int = Field(..., description="Current concurrent run limit")
+    min_limit: int = Field(..., description="Lowest limit the limiter may set")
+    max_limit: int = Field(..., description="Highest limit the limiter may set")
+    in_flight: int = Field(..., description="Runs currently executing")
+    queued: int = Field(..., description="Runs waiting for a slot")
+    samples: int = Field(..., description="Time-to-first-token samples observed across models")
+    models: Dict[str, ModelLatency] = Field(..., description="Time-to-first-token estimates per model")
+    errors: Dict[str, int] = Field(..., description="Rate-limit, overload and timeout errors seen since startup")
+    adjustments: list[LimitAdjustment] = Field(..., description="Recent limit changes, oldest first")
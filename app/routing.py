@@ -0,0 +1,236 @@
+"""Model routing rules and fallback classification for agent runs.
+
+Rules come from the ``routes`` list in agent.md frontmatter and are checked
+in order; the first rule whose conditions all hold picks the model:
+
+    model: claude-sonnet-4-5
+    fallback_model: claude-haiku-4-5
+    routes:
+      - name: tiny-payloads
+        max_payload_bytes: 2048
+        model: claude-haiku-4-5
+      - name: tight-budget
+        max_latency_budget_ms: 5000
+        model: claude-haiku-4-5
+        fallback_model: null
+      - name: premium
+        clients: [acme]
+        model: claude-opus-4-5
+
+``clients`` match the client name an API key authenticates as
+(``CLIENT_API_KEYS``), never the key itself, so agent.md holds no secrets.
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Optional
+
+FALLBACK_REASONS = ("timeout", "overloaded")
+
+# API error types, or the HTTP status as the CLI prints it ("API Error: 529", "Error code: 429")
+_OVERLOADED = re.compile(r"\boverloaded_error\b|\b(?:api error|error code|status(?: code)?)\W{0,3}529\b")
+_RATE_LIMITED = re.compile(r"\brate_limit_error\b|\b(?:api error|error code|status(?: code)?)\W{0,3}429\b")
+
+# AssistantMessage.error values that map to a kind on their own
+_API_ERROR_KINDS = {"rate_limit": "rate_limited", "server_error": "overloaded"}
+
+
+def _classify_message(message: str) -> Optional[str]:
+    message = message.lower()
+    if _OVERLOADED.search(message):
+        return "overloaded"
+    if _RATE_LIMITED.search(message):
+        return "rate_limited"
+    return None
+
+
+class AgentAPIError(RuntimeError):
+    """The CLI reported a failed run in-band rather than raising.
+
+    Upstream API failures arrive as an ``AssistantMessage`` whose ``error`` is
+    set (``"rate_limit"``, ``"server_error"``, ...) with the API's message as
+    text; other failures as a ``ResultMessage`` with ``is_error``. ``kind`` is
+    the :func:`classify_error` result for it.
+    """
+
+    def __init__(self, error: str, message: str):
+        super().__init__(f"{error}: {message}" if message else error)
+        self.error = error
+        self.kind = _classify_message(message) or _API_ERROR_KINDS.get(error)
+
+
+def classify_error(exc: BaseException) -> Optional[str]:
+    """Classify an agent error as ``timeout``, ``overloaded`` or ``rate_limited``.
+
+    :class:`AgentAPIError` and errors relayed from worker processes carry
+    their kind; anything else is recognised by the API error type or status
+    code in its message. Bare numbers ("5290 rows", "1429 tokens") never match.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    if hasattr(exc, "kind"):
+        return exc.kind
+    return _classify_message(str(exc))
+
+
+def _check_int(value: Any, where: str, minimum: int = 0) -> Optional[int]:
+    """Return ``value`` if it is None or an int >= ``minimum``, else raise."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise ValueError(f"{where} must be an integer >= {minimum}, got {value!r}")
+    return value
+
+
+def _check_str(value: Any, where: str, required: bool = False) -> Optional[str]:
+    """Return ``value`` if it is a non-empty string (or None when optional), else raise."""
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{where} must be a non-empty string, got {value!r}")
+    return value
+
+
+@dataclass
+class RouteRule:
+    """One routing rule from agent.md frontmatter."""
+
+    model: str
+    name: Optional[str] = None
+    max_payload_bytes: Optional[int] = None
+    min_payload_bytes: Optional[int] = None
+    max_latency_budget_ms: Optional[int] = None
+    clients: list[str] = field(default_factory=list)
+    fallback_model: Optional[str] = None
+    timeout_ms: Optional[int] = None
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        index: int,
+        fallback_model: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+    ) -> "RouteRule":
+        """Build a rule from a frontmatter mapping, rejecting unknown keys and bad values.
+
+        ``fallback_model`` and ``timeout_ms`` default to the agent-level values;
+        set them to null on a rule to disable them for that route.
+        """
+        where = f"Route #{index + 1}"
+        if not isinstance(data, dict) or "model" not in data:
+            raise ValueError(f"{where} must be a mapping with a 'model' key")
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"{where} has unknown keys: {sorted(unknown)}")
+
+        rule = cls(**{"fallback_model": fallback_model, "timeout_ms": timeout_ms, **data})
+        _check_str(rule.model, f"{where} 'model'", required=True)
+        _check_str(rule.name, f"{where} 'name'")
+        _check_str(rule.fallback_model, f"{where} 'fallback_model'")
+        _check_int(rule.max_payload_bytes, f"{where} 'max_payload_bytes'")
+        _check_int(rule.min_payload_bytes, f"{where} 'min_payload_bytes'")
+        _check_int(rule.max_latency_budget_ms, f"{where} 'max_latency_budget_ms'")
+        _check_int(rule.timeout_ms, f"{where} 'timeout_ms'", minimum=1)
+        if isinstance(rule.clients, str):
+            rule.clients = [rule.clients]
+        if not isinstance(rule.clients, list):
+            raise ValueError(f"{where} 'clients' must be a list of client names, got {rule.clients!r}")
+        for client in rule.clients:
+            _check_str(client, f"{where} 'clients' entry", required=True)
+
+        if rule.name is None:
+            rule.name = f"route-{index + 1}"
+        return rule
+
+    def match(
+        self, payload_bytes: int, latency_budget_ms: Optional[int], client: Optional[str]
+    ) -> Optional[str]:
+        """Return why the rule matches, or None if any condition fails."""
+        reasons = []
+        if self.max_payload_bytes is not None:
+            if payload_bytes > self.max_payload_bytes:
+                return None
+            reasons.append(f"payload_bytes={payload_bytes} <= {self.max_payload_bytes}")
+        if self.min_payload_bytes is not None:
+            if payload_bytes < self.min_payload_bytes:
+                return None
+            reasons.append(f"payload_bytes={payload_bytes} >= {self.min_payload_bytes}")
+        if self.max_latency_budget_ms is not None:
+            if latency_budget_ms is None or latency_budget_ms > self.max_latency_budget_ms:
+                return None
+            reasons.append(f"latency_budget_ms={latency_budget_ms} <= {self.max_latency_budget_ms}")
+        if self.clients:
+            if client not in self.clients:
+                return None
+            reasons.append(f"client={client}")
+        return ", ".join(reasons) or "unconditional"
+
+
+def parse_routes(routes: Any, fallback_model: Any = None, timeout_ms: Any = None) -> list[RouteRule]:
+    """Validate agent-level routing settings and build the ordered rules."""
+    _check_str(fallback_model, "'fallback_model'")
+    _check_int(timeout_ms, "'timeout_ms'", minimum=1)
+    if routes is None:
+        return []
+    if not isinstance(routes, list):
+        raise ValueError(f"'routes' must be a list of rules, got {type(routes).__name__}")
+    return [
+        RouteRule.from_dict(rule, i, fallback_model=fallback_model, timeout_ms=timeout_ms)
+        for i, rule in enumerate(routes)
+    ]
+
+
+@dataclass
+class RouteDecision:
+    """Model chosen for a run, and why."""
+
+    name: str
+    model: str
+    reason: str
+    fallback_model: Optional[str] = None
+    timeout_ms: Optional[int] = None
+
+
+class ModelRouter:
+    """Pick a model per run from ordered rules, falling back to the default model."""
+
+    def __init__(
+        self,
+        rules: list[RouteRule],
+        default_model: str,
+        fallback_model: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+    ):
+        self.rules = rules
+        self.default_model = default_model
+        self.fallback_model = fallback_model
+        self.timeout_ms = timeout_ms
+
+    def route(
+        self,
+        payload_bytes: int,
+        latency_budget_ms: Optional[int] = None,
+        client: Optional[str] = None,
+    ) -> RouteDecision:
+        for rule in self.rules:
+            reason = rule.match(payload_bytes, latency_budget_ms, client)
+            if reason is None:
+                continue
+            return RouteDecision(
+                name=rule.name,
+                model=rule.model,
+                reason=reason,
+                fallback_model=rule.fallback_model,
+                timeout_ms=rule.timeout_ms,
+            )
+
+        return RouteDecision(
+            name="default",
+            model=self.default_model,
+            reason="no rule matched" if self.rules else "no rules configured",
+            fallback_model=self.fallback_model,
+            timeout_ms=self.timeout_ms,
+        )
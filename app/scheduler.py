@@ -0,0 +1,220 @@
+"""Priority scheduling of agent runs across interactive and background lanes."""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Literal, Optional
+
+from app.config import settings
+
+Priority = Literal["high", "normal", "low"]
+
+# Lane order, most urgent first. "low" is the background lane; the others are interactive.
+LANES: tuple[Priority, ...] = ("high", "normal", "low")
+BACKGROUND_LANE: Priority = "low"
+
+# Recent wait times kept per lane for percentile stats
+WAIT_SAMPLE_SIZE = 500
+
+
+@dataclass
+class _Waiter:
+    """A run waiting for a slot."""
+
+    lane: Priority
+    seq: int
+    enqueued_at: float
+    future: asyncio.Future
+
+
+@dataclass
+class _LaneStats:
+    """Counters for a single lane."""
+
+    running: int = 0
+    started: int = 0
+    completed: int = 0
+    waits_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=WAIT_SAMPLE_SIZE))
+    max_wait_ms: float = 0.0
+
+
+@dataclass
+class SlotTicket:
+    """Handed to the caller once a run has been admitted."""
+
+    lane: Priority
+    wait_ms: float
+
+
+class PriorityScheduler:
+    """Admit agent runs by lane priority under a shared concurrency cap.
+
+    - Interactive lanes (``high``, ``normal``) can use every slot; the
+      background lane is kept out of the last ``reserved_interactive`` slots.
+    - Waiting runs age: every ``aging_seconds`` spent queued moves a run one
+      lane up, so an aged background run competes as interactive work
+      (reserved slots included) and is not starved. A timer re-runs dispatch
+      at the next promotion, so aging applies even when nothing else happens.
+    - ``max_concurrency`` may be changed at runtime; call :meth:`set_limit`.
+    """
+
+    def __init__(self, max_concurrency: int, reserved_interactive: int = 1, aging_seconds: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive = reserved_interactive
+        self.aging_seconds = aging_seconds
+        self.in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._lanes: Dict[Priority, _LaneStats] = {lane: _LaneStats() for lane in LANES}
+        self._aging_timer: Optional[asyncio.TimerHandle] = None
+
+    @classmethod
+    def from_settings(cls) -> "PriorityScheduler":
+        max_concurrency = settings.max_concurrent_runs or settings.worker_pool_size or 8
+        return cls(
+            max_concurrency=max_concurrency,
+            reserved_interactive=min(settings.interactive_reserved_runs, max_concurrency - 1),
+            aging_seconds=settings.priority_aging_seconds,
+        )
+
+    def _rank_limit(self, rank: int) -> int:
+        """Total in-flight runs above which a run at ``rank`` may not start."""
+        if LANES[rank] == BACKGROUND_LANE:
+            return max(self.max_concurrency - self.reserved_interactive, 1)
+        return self.max_concurrency
+
+    def _effective_rank(self, waiter: _Waiter, now: float) -> int:
+        rank = LANES.index(waiter.lane)
+        if self.aging_seconds > 0:
+            rank -= int((now - waiter.enqueued_at) // self.aging_seconds)
+        return max(rank, 0)
+
+    def _grant(self, lane: Priority, enqueued_at: float, now: float) -> SlotTicket:
+        self.in_flight += 1
+        stats = self._lanes[lane]
+        stats.running += 1
+        stats.started += 1
+        wait_ms = (now - enqueued_at) * 1000
+        stats.waits_ms.append(wait_ms)
+        stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+        return SlotTicket(lane=lane, wait_ms=wait_ms)
+
+    def _admit_waiting(self) -> None:
+        """Grant slots to waiting runs in aged-priority order."""
+        now = time.monotonic()
+        while self._waiters and self.in_flight < self.max_concurrency:
+            ranked = [(self._effective_rank(w, now), w.seq, w) for w in self._waiters]
+            eligible = [r for r in ranked if self.in_flight < self._rank_limit(r[0])]
+            if not eligible:
+                return
+            _, _, waiter = min(eligible, key=lambda r: r[:2])
+            self._waiters.remove(waiter)
+            waiter.future.set_result(self._grant(waiter.lane, waiter.enqueued_at, now))
+
+    def _dispatch(self) -> None:
+        """Start as many waiting runs as the current limits allow."""
+        self._admit_waiting()
+        self._schedule_aging()
+
+    def _schedule_aging(self) -> None:
+        """Re-run dispatch when the next waiting run is due for promotion."""
+        if self._aging_timer is not None:
+            self._aging_timer.cancel()
+            self._aging_timer = None
+        if self.aging_seconds <= 0:
+            return
+
+        now = time.monotonic()
+        promotions = [
+            w.enqueued_at + (int((now - w.enqueued_at) // self.aging_seconds) + 1) * self.aging_seconds
+            for w in self._waiters
+            if self._effective_rank(w, now) > 0
+        ]
+        if promotions:
+            delay = max(min(promotions) - now, 0.0)
+            self._aging_timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _release(self, lane: Priority) -> None:
+        self.in_flight -= 1
+        stats = self._lanes[lane]
+        stats.running -= 1
+        stats.completed += 1
+        self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        """Runs waiting for a slot across all lanes."""
+        return len(self._waiters)
+
+    def set_limit(self, max_concurrency: int) -> None:
+        """Change the concurrency cap and admit waiting runs if it grew."""
+        self.max_concurrency = max(max_concurrency, 1)
+        self._dispatch()
+
+    async def acquire(self, lane: Priority) -> SlotTicket:
+        """Wait for a slot in ``lane``; prefer :meth:`slot`, which also releases it."""
+        now = time.monotonic()
+        if not self._waiters and self.in_flight < self._rank_limit(LANES.index(lane)):
+            return self._grant(lane, now, now)
+
+        waiter = _Waiter(
+            lane=lane,
+            seq=next(self._seq),
+            enqueued_at=now,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._waiters.append(waiter)
+        # A newcomer may still be admissible ahead of waiters stuck behind the background limit
+        self._dispatch()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just as we were cancelled; hand it on
+                self._release(lane)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, lane: Priority) -> AsyncIterator[SlotTicket]:
+        """Hold a run slot in ``lane`` for the duration of the block."""
+        ticket = await self.acquire(lane)
+        try:
+            yield ticket
+        finally:
+            self._release(lane)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-lane queue depth, running count and wait-time stats."""
+        lanes: Dict[str, Any] = {}
+        for lane, stats in self._lanes.items():
+            waits = sorted(stats.waits_ms)
+            lanes[lane] = {
+                "queued": sum(1 for w in self._waiters if w.lane == lane),
+                "running": stats.running,
+                "started": stats.started,
+                "completed": stats.completed,
+                "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+                "wait_ms_p50": round(_percentile(waits, 0.50), 1),
+                "wait_ms_p95": round(_percentile(waits, 0.95), 1),
+                "wait_ms_max": round(stats.max_wait_ms, 1),
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "reserved_interactive": self.reserved_interactive,
+            "aging_seconds": self.aging_seconds,
+            "in_flight": self.in_flight,
+            "lanes": lanes,
+        }
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
@@ -0,0 +1,373 @@
+"""Per-run tracing with an in-memory timeline store and OTLP/JSON export.
+
+Spans are plain dataclasses timed with ``time.time_ns()`` so they can be
+created in worker processes and shipped back over the worker pipe. Finished
+spans are kept in a bounded in-memory store (served by ``GET /runs/{id}/trace``)
+and handed to an exporter thread that batches them as OTLP/JSON to a JSON-lines
+file and/or an OTLP/HTTP collector, so the event loop never waits on I/O.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def trace_id_for(request_id: str) -> str:
+    """Map a request ID (UUID string) to a 32-hex-character trace ID."""
+    return request_id.replace("-", "").lower()
+
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+@dataclass
+class Span:
+    """A timed operation within a run's trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        """Attach attributes to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Span":
+        return cls(**data)
+
+
+def current_span() -> Optional[Span]:
+    """Span activated for the current request, if any."""
+    return _current_span.get()
+
+
+@contextmanager
+def use_span(span: Span) -> Iterator[Span]:
+    """Make ``span`` the current span for code (and tasks) started inside the block.
+
+    Only use from a plain coroutine or function; async generators should pass
+    parents explicitly since they may resume in a different context.
+    """
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, ensure_ascii=False, default=str)}
+
+
+def to_otlp(spans: list[Span], service_name: str) -> Dict[str, Any]:
+    """Build an OTLP/JSON ExportTraceServiceRequest body."""
+    otlp_spans = []
+    for span in spans:
+        otlp_span: Dict[str, Any] = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        otlp_spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+                },
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Export finished spans as OTLP/JSON from a background thread.
+
+    Batches go to ``file_path`` (one ExportTraceServiceRequest per line, the
+    same layout as the OpenTelemetry Collector file exporter) and/or are POSTed
+    to ``endpoint`` (an OTLP/HTTP ``/v1/traces`` URL). When the queue is full,
+    spans are dropped rather than slowing down requests.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        file_path: Optional[Path] = None,
+        endpoint: Optional[str] = None,
+        service_name: str = "agent-api",
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_queue: int = 10_000,
+    ):
+        self.file_path = file_path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Queue a finished span for export (non-blocking)."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush queued spans and stop the exporter thread."""
+        if self._thread is None:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: list[Span] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list[Span]) -> None:
+        body = to_otlp(batch, self.service_name)
+        try:
+            if self.file_path:
+                with self.file_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(body, ensure_ascii=False, default=str) + "\n")
+            if self.endpoint:
+                httpx.post(self.endpoint, json=body, timeout=5.0).raise_for_status()
+        except Exception as e:
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "trace_export_error",
+                        "error": str(e),
+                        "error_type": type(e).__name__,
+                        "spans": len(batch),
+                    }
+                )
+            )
+
+
+class Tracer:
+    """Create spans and keep the most recent traces in memory."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        buffer_size: int = 500,
+        exporter: Optional[SpanExporter] = None,
+    ):
+        self.enabled = enabled
+        self.buffer_size = buffer_size
+        self.exporter = exporter
+        self._traces: "OrderedDict[str, list[Span]]" = OrderedDict()
+
+    @classmethod
+    def from_settings(cls) -> "Tracer":
+        exporter = None
+        if settings.trace_file or settings.trace_otlp_endpoint:
+            exporter = SpanExporter(
+                file_path=settings.trace_file,
+                endpoint=settings.trace_otlp_endpoint,
+                service_name=settings.trace_service_name,
+            )
+        return cls(
+            enabled=settings.tracing_enabled,
+            buffer_size=settings.trace_buffer_size,
+            exporter=exporter,
+        )
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        *,
+        trace_id: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        **attributes: Any,
+    ) -> Span:
+        """Start a span under ``parent`` (or as the root of ``trace_id``)."""
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else (trace_id or os.urandom(16).hex()),
+            span_id=_new_span_id(),
+            parent_id=parent.span_id if parent else None,
+            start_ns=start_ns or time.time_ns(),
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None, *, end_ns: Optional[int] = None) -> None:
+        """Finish a span and record it."""
+        if span.end_ns is not None:
+            return
+        span.end_ns = end_ns or time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        self.record(span)
+
+    @contextmanager
+    def span(
+        self, name: str, parent: Optional[Span] = None, *, trace_id: Optional[str] = None, **attributes: Any
+    ) -> Iterator[Span]:
+        """Time the block as a span; exceptions mark it as failed and propagate."""
+        span = self.start_span(name, parent, trace_id=trace_id, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        self.end_span(span)
+
+    def record(self, span: Span) -> None:
+        """Store a finished span (possibly created in another process) and export it."""
+        if not self.enabled:
+            return
+        spans = self._traces.get(span.trace_id)
+        if spans is None:
+            spans = self._traces[span.trace_id] = []
+            while len(self._traces) > self.buffer_size:
+                self._traces.popitem(last=False)
+        spans.append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def get_trace(self, trace_id: str) -> list[Span]:
+        """Finished spans of a trace, oldest first."""
+        return sorted(self._traces.get(trace_id, []), key=lambda s: s.start_ns)
+
+    def pop_trace(self, trace_id: str) -> list[Span]:
+        """Remove and return a trace's finished spans."""
+        return self._traces.pop(trace_id, [])
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def timeline(spans: list[Span]) -> list[Dict[str, Any]]:
+    """Flatten spans into depth-first order with offsets from the trace start."""
+    if not spans:
+        return []
+
+    trace_start = min(s.start_ns for s in spans)
+    span_ids = {s.span_id for s in spans}
+    children: Dict[Optional[str], list[Span]] = {}
+    for span in spans:
+        # Spans whose parent was not recorded (still running, or in another service) become roots
+        parent_id = span.parent_id if span.parent_id in span_ids else None
+        children.setdefault(parent_id, []).append(span)
+
+    rows: list[Dict[str, Any]] = []
+
+    def walk(parent_id: Optional[str], depth: int) -> None:
+        for span in sorted(children.get(parent_id, []), key=lambda s: s.start_ns):
+            rows.append(
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "depth": depth,
+                    "start_offset_ms": round((span.start_ns - trace_start) / 1e6, 2),
+                    "duration_ms": round(span.duration_ms or 0.0, 2),
+                    "error": span.error,
+                    "attributes": span.attributes,
+                }
+            )
+            walk(span.span_id, depth + 1)
+
+    walk(None, 0)
+    return rows
+
+
+def render_timeline(rows: list[Dict[str, Any]], width: int = 48) -> str:
+    """Render timeline rows as a plain-text waterfall chart."""
+    if not rows:
+        return ""
+
+    total_ms = max(r["start_offset_ms"] + r["duration_ms"] for r in rows) or 1.0
+    label_width = max(len("  " * r["depth"] + r["name"]) for r in rows)
+    lines = []
+    for r in rows:
+        label = ("  " * r["depth"] + r["name"]).ljust(label_width)
+        start = int(r["start_offset_ms"] / total_ms * width)
+        length = max(int(r["duration_ms"] / total_ms * width), 1)
+        bar = (" " * start + "█" * length).ljust(width)[:width]
+        marker = " !" if r["error"] else ""
+        lines.append(f"{label} |{bar}| {r['start_offset_ms']:>9.1f} +{r['duration_ms']:.1f}ms{marker}")
+    return "\n".join(lines) + "\n"
+
+
+# Global tracer instance
+tracer = Tracer.from_settings()
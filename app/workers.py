@@ -0,0 +1,432 @@
+"""Pre-started worker processes that execute agent runs outside the API process.
+
+Each worker process gets a fresh working directory (removed when it exits),
+and every run executes in its own empty subdirectory of it, so files left by
+one run are never visible to another. Workers also get optional memory/CPU
+rlimits and a run budget after which they are recycled. The API process talks to a worker over a
+multiprocessing pipe:
+
+    API -> worker:  (payload, request_id, parent_span, model, first_turn_timeout)  or  None to shut down
+    worker -> API:  ("chunk", text) / ("progress", {field: value}) ...
+                    then ("end", {"error", "error_type", "kind", "recycle", "spans"})
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.agent import AgentConfig, AgentExecutor, RunProgress, log_event
+from app.config import settings
+from app.routing import classify_error
+from app.tracing import Span, trace_id_for, tracer
+
+
+class WorkerRunError(RuntimeError):
+    """Agent run failed inside a worker process.
+
+    ``kind`` is the worker-side :func:`classify_error` result.
+    """
+
+    def __init__(self, error_type: str, message: str, kind: Optional[str] = None):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+        self.kind = kind
+
+
+class WorkerCrashedError(RuntimeError):
+    """Worker process exited before finishing a run (e.g. killed by an rlimit)."""
+
+
+class WorkerUnavailableError(RuntimeError):
+    """No worker became idle within the pool's acquire timeout."""
+
+
+@dataclass
+class WorkerLimits:
+    """Resource settings applied to every worker process."""
+
+    max_runs: int = 50
+    memory_limit_mb: int = 0
+    cpu_limit_seconds: int = 0
+
+    @classmethod
+    def from_settings(cls) -> "WorkerLimits":
+        return cls(
+            max_runs=settings.worker_max_runs,
+            memory_limit_mb=settings.worker_memory_limit_mb,
+            cpu_limit_seconds=settings.worker_cpu_limit_seconds,
+        )
+
+
+def _apply_limits(limits: WorkerLimits) -> None:
+    """Set rlimits on the current process (inherited by the CLI it spawns)."""
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return
+
+    if limits.memory_limit_mb:
+        max_bytes = limits.memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+    if limits.cpu_limit_seconds:
+        resource.setrlimit(
+            resource.RLIMIT_CPU, (limits.cpu_limit_seconds, limits.cpu_limit_seconds + 5)
+        )
+
+
+class _PipeProgress(RunProgress):
+    """Run progress that is also sent to the API process as it changes."""
+
+    def __init__(self, conn: Connection):
+        super().__init__()
+        self._conn = conn
+
+    def update(self, **changes: Any) -> None:
+        super().update(**changes)
+        self._conn.send(("progress", changes))
+
+
+async def _run_job(
+    executor: AgentExecutor,
+    conn: Connection,
+    payload: Dict[str, Any],
+    request_id: str,
+    parent: Optional[Span],
+    model: Optional[str],
+    first_turn_timeout: Optional[float],
+) -> Optional[Exception]:
+    """Stream one agent run back over the pipe; return the error, if any."""
+    try:
+        async for chunk in executor.stream_local(
+            payload,
+            request_id,
+            parent,
+            model=model,
+            progress=_PipeProgress(conn),
+            first_turn_timeout=first_turn_timeout,
+        ):
+            conn.send(("chunk", chunk))
+    except Exception as e:
+        return e
+    return None
+
+
+def _worker_main(
+    slot: int,
+    conn: Connection,
+    agent_config: AgentConfig,
+    model: str,
+    workdir: Path,
+    limits: WorkerLimits,
+) -> None:
+    """Entry point of a worker process."""
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level.upper()),
+        format="%(message)s",
+    )
+    _apply_limits(limits)
+    os.chdir(workdir)
+
+    executor = AgentExecutor(agent_config)
+    executor.model = model
+    # Spans are shipped back to the API process, which stores and exports them
+    tracer.exporter = None
+
+    runs = 0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+
+        payload, request_id, parent, run_model, first_turn_timeout = job
+        parent_span = Span.from_dict(parent) if parent else None
+        run_dir = tempfile.mkdtemp(prefix="run-", dir=workdir)
+        os.chdir(run_dir)
+        try:
+            error = asyncio.run(
+                _run_job(executor, conn, payload, request_id, parent_span, run_model, first_turn_timeout)
+            )
+        finally:
+            os.chdir(workdir)
+            shutil.rmtree(run_dir, ignore_errors=True)
+        spans = tracer.pop_trace(trace_id_for(request_id))
+        runs += 1
+        recycle = bool(limits.max_runs) and runs >= limits.max_runs
+        conn.send(
+            (
+                "end",
+                {
+                    "error": str(error) if error else None,
+                    "error_type": type(error).__name__ if error else None,
+                    "kind": classify_error(error) if error else None,
+                    "recycle": recycle,
+                    "spans": [span.to_dict() for span in spans],
+                },
+            )
+        )
+        if recycle:
+            break
+
+    conn.close()
+
+
+@dataclass
+class _WorkerHandle:
+    """API-side view of a running worker process."""
+
+    slot: int
+    process: multiprocessing.process.BaseProcess
+    conn: Connection
+    workdir: Path
+    runs: int = 0
+
+
+class WorkerPool:
+    """Fixed-size pool of agent worker processes.
+
+    Workers are started with the ``spawn`` method so they never inherit the
+    API process's event loop or threads. A worker that hits its run budget,
+    crashes, or is abandoned mid-run (client disconnect) is replaced in the
+    background with a fresh process in the same slot; failed respawns are
+    retried with backoff until the pool stops.
+
+    Pipes are read with an event-loop reader rather than a thread, so a
+    long run never ties up the default executor.
+    """
+
+    # Process entry point: (slot, conn, agent_config, model, workdir, limits)
+    target = staticmethod(_worker_main)
+
+    # Backoff between attempts to respawn a worker slot
+    RESPAWN_BACKOFF_SECONDS = (1.0, 2.0, 5.0, 10.0, 30.0)
+
+    def __init__(
+        self,
+        executor: AgentExecutor,
+        size: int,
+        limits: WorkerLimits,
+        base_dir: Optional[Path] = None,
+        acquire_timeout: float = 60.0,
+    ):
+        self.executor = executor
+        self.size = size
+        self.limits = limits
+        self.acquire_timeout = acquire_timeout
+        self.base_dir = base_dir or Path(tempfile.gettempdir()) / "agent-workers"
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: Dict[int, _WorkerHandle] = {}
+        self._idle: asyncio.Queue[_WorkerHandle] = asyncio.Queue()
+        self._respawns: set[asyncio.Task] = set()
+        self._closed = False
+        self.recycled = 0
+
+    def _spawn(self, slot: int) -> _WorkerHandle:
+        """Start a worker process for ``slot`` in a fresh directory (blocking)."""
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        workdir = Path(tempfile.mkdtemp(prefix=f"worker-{slot}-", dir=self.base_dir))
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=self.target,
+            args=(
+                slot,
+                child_conn,
+                self.executor.config,
+                self.executor.model,
+                workdir,
+                self.limits,
+            ),
+            name=f"agent-worker-{slot}",
+            daemon=True,
+        )
+        try:
+            process.start()
+        except Exception:
+            parent_conn.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        finally:
+            child_conn.close()
+
+        worker = _WorkerHandle(slot=slot, process=process, conn=parent_conn, workdir=workdir)
+        self._workers[slot] = worker
+        log_event("worker_started", slot=slot, pid=process.pid)
+        return worker
+
+    def _retire(self, worker: _WorkerHandle) -> None:
+        """Stop a worker process and release its pipe (blocking)."""
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(timeout=5)
+        worker.conn.close()
+        shutil.rmtree(worker.workdir, ignore_errors=True)
+        log_event(
+            "worker_stopped",
+            slot=worker.slot,
+            pid=worker.process.pid,
+            runs=worker.runs,
+            exit_code=worker.process.exitcode,
+        )
+
+    async def start(self) -> None:
+        """Start all workers."""
+        for slot in range(self.size):
+            worker = await asyncio.to_thread(self._spawn, slot)
+            self._idle.put_nowait(worker)
+        log_event("worker_pool_started", size=self.size, base_dir=str(self.base_dir))
+
+    async def stop(self) -> None:
+        """Ask every worker to exit and wait for them."""
+        self._closed = True
+        for task in list(self._respawns):
+            task.cancel()
+        for worker in list(self._workers.values()):
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            await asyncio.to_thread(self._retire, worker)
+        self._workers.clear()
+        log_event("worker_pool_stopped")
+
+    async def _replace(self, worker: _WorkerHandle, finished: bool) -> None:
+        """Retire ``worker`` and put a fresh process in its slot.
+
+        Workers that finished their run exit on their own; anything else
+        (crash, abandoned stream) is terminated right away.
+        """
+        if not finished and worker.process.is_alive():
+            worker.process.terminate()
+        await asyncio.to_thread(self._retire, worker)
+        self.recycled += 1
+
+        attempt = 0
+        while not self._closed:
+            try:
+                replacement = await asyncio.to_thread(self._spawn, worker.slot)
+            except Exception as e:
+                delay = self.RESPAWN_BACKOFF_SECONDS[min(attempt, len(self.RESPAWN_BACKOFF_SECONDS) - 1)]
+                attempt += 1
+                log_event(
+                    "worker_respawn_error",
+                    slot=worker.slot,
+                    attempt=attempt,
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    retry_in_seconds=delay,
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if self._closed:
+                # Pool stopped while the process was starting
+                replacement.conn.send(None)
+                await asyncio.to_thread(self._retire, replacement)
+                return
+            self._idle.put_nowait(replacement)
+            return
+
+    def _release(self, worker: _WorkerHandle, finished: bool, recycle: bool) -> None:
+        """Return a worker to the idle queue or schedule its replacement."""
+        if finished and not recycle and not self._closed and worker.process.is_alive():
+            self._idle.put_nowait(worker)
+            return
+        task = asyncio.get_running_loop().create_task(self._replace(worker, finished))
+        self._respawns.add(task)
+        task.add_done_callback(self._respawns.discard)
+
+    async def _acquire(self) -> _WorkerHandle:
+        """Take an idle worker, waiting at most ``acquire_timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self._idle.get(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise WorkerUnavailableError(
+                f"No idle worker within {self.acquire_timeout:g}s "
+                f"({len(self._respawns)} of {self.size} slots respawning)"
+            )
+
+    async def _recv(self, conn: Connection) -> Any:
+        """Wait for the next message on ``conn`` without blocking a thread."""
+        loop = asyncio.get_running_loop()
+        fd = conn.fileno()
+        while not conn.poll():
+            readable = loop.create_future()
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(fd)
+        return conn.recv()
+
+    async def stream(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        parent: Optional[Span] = None,
+        model: Optional[str] = None,
+        progress: Optional[RunProgress] = None,
+        first_turn_timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Run the agent on an idle worker, yielding text chunks as they arrive.
+
+        Progress reported by the worker is applied to ``progress``.
+        """
+        worker = await self._acquire()
+        finished = recycle = False
+        run_span = tracer.start_span(
+            "worker.run",
+            parent,
+            trace_id=trace_id_for(request_id),
+            slot=worker.slot,
+            pid=worker.process.pid,
+            worker_runs=worker.runs,
+            model=model or self.executor.model,
+        )
+        error: Optional[BaseException] = None
+        try:
+            log_event("worker_assigned", request_id=request_id, slot=worker.slot, pid=worker.process.pid)
+            try:
+                worker.conn.send((payload, request_id, run_span.to_dict(), model, first_turn_timeout))
+            except OSError:
+                raise WorkerCrashedError(f"Worker {worker.slot} is not accepting runs")
+            while True:
+                try:
+                    kind, data = await self._recv(worker.conn)
+                except (EOFError, OSError):
+                    raise WorkerCrashedError(
+                        f"Worker {worker.slot} exited during run "
+                        f"(exit code {worker.process.exitcode})"
+                    )
+
+                if kind == "chunk":
+                    yield data
+                    continue
+                if kind == "progress":
+                    if progress is not None:
+                        progress.update(**data)
+                    continue
+
+                worker.runs += 1
+                finished, recycle = True, data["recycle"]
+                for span in data["spans"]:
+                    tracer.record(Span.from_dict(span))
+                if data["error"] is not None:
+                    raise WorkerRunError(data["error_type"], data["error"], data["kind"])
+                return
+        except (Exception, asyncio.CancelledError) as e:
+            error = e
+            raise
+        finally:
+            run_span.set(recycled=not finished or recycle)
+            tracer.end_span(run_span, error=error)
+            self._release(worker, finished, recycle)
@@ -0,0 +1,39 @@
+"""Shared test setup."""
+
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+# app.config builds its settings at import time and requires an API key
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+# app.agent loads its agent at import time
+os.environ.setdefault("AGENT_FILE_PATH", str(Path(__file__).parent / "agent.md"))
+
+
+@pytest.fixture
+def fake_query(monkeypatch):
+    """Replace the SDK's ``query()`` with a scripted one; returns an installer.
+
+    ``install(script)`` takes ``script(model) -> list`` whose items are SDK
+    messages to yield, numbers to sleep for, or exceptions to raise. The
+    installer returns the list of models queried, in call order.
+    """
+    models: list[str] = []
+
+    def install(script):
+        async def query(prompt, options):
+            models.append(options.model)
+            for item in script(options.model):
+                if isinstance(item, BaseException):
+                    raise item
+                if isinstance(item, (int, float)):
+                    await asyncio.sleep(item)
+                    continue
+                yield item
+
+        monkeypatch.setattr("app.agent.query", query)
+        return models
+
+    return install
@@ -0,0 +1,128 @@
+"""Tests for agent execution against a scripted SDK ``query()``."""
+
+import asyncio
+
+import pytest
+from claude_agent_sdk import (
+    AssistantMessage,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+
+from app.agent import AgentConfig, AgentExecutor
+from app.limiter import AdaptiveLimiter
+from app.routing import AgentAPIError, classify_error
+from app.scheduler import PriorityScheduler
+
+PRIMARY = "claude-sonnet-4-5"
+FALLBACK = "claude-haiku-4-5"
+
+
+def _executor(**config) -> AgentExecutor:
+    executor = AgentExecutor(
+        AgentConfig(
+            name="test",
+            model=PRIMARY,
+            system_prompt="Test.",
+            allowed_tools=["Read"],
+            fallback_model=FALLBACK,
+            **config,
+        )
+    )
+    executor.model = executor.router.default_model = PRIMARY
+    return executor
+
+
+def _init() -> SystemMessage:
+    return SystemMessage(subtype="init", data={})
+
+
+def _text(model: str, text: str, error=None) -> AssistantMessage:
+    return AssistantMessage(content=[TextBlock(text=text)], model=model, error=error)
+
+
+def _result(is_error: bool = False, result=None, subtype: str = "success") -> ResultMessage:
+    return ResultMessage(
+        subtype=subtype,
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=is_error,
+        num_turns=1,
+        session_id="s",
+        result=result,
+    )
+
+
+def _overloaded(model: str) -> list:
+    text = 'API Error: 529 {"type":"error","error":{"type":"overloaded_error","message":"Overloaded"}}'
+    return [_init(), _text(model, text, error="server_error"), _result(True, text)]
+
+
+def _collect(executor: AgentExecutor) -> str:
+    async def main():
+        return "".join([c async for c in executor.stream_execute({"task": "x"}, "req-1")])
+
+    return asyncio.run(main())
+
+
+def test_api_error_message_falls_back_without_leaking_text(fake_query):
+    models = fake_query(
+        lambda model: _overloaded(model) if model == PRIMARY else [_init(), _text(model, "ok"), _result()]
+    )
+    assert _collect(_executor()) == "ok"
+    assert models == [PRIMARY, FALLBACK]
+
+
+def test_rate_limit_message_raises_classified_error(fake_query):
+    text = 'API Error: 429 {"type":"error","error":{"type":"rate_limit_error"}}'
+    models = fake_query(lambda model: [_init(), _text(model, text, error="rate_limit"), _result(True, text)])
+
+    with pytest.raises(AgentAPIError) as exc_info:
+        _collect(_executor())
+    assert exc_info.value.error == "rate_limit"
+    assert classify_error(exc_info.value) == "rate_limited"
+    # Rate limits are not a fallback reason
+    assert models == [PRIMARY]
+
+
+def test_error_result_raises(fake_query):
+    fake_query(lambda model: [_init(), _text(model, "partial"), _result(True, subtype="error_max_turns")])
+    with pytest.raises(AgentAPIError) as exc_info:
+        _collect(_executor())
+    assert exc_info.value.error == "error_max_turns"
+    assert classify_error(exc_info.value) is None
+
+
+def test_no_fallback_after_tool_call(fake_query):
+    tool_turn = AssistantMessage(
+        content=[ToolUseBlock(id="t1", name="Read", input={"file_path": "/x"})], model=PRIMARY
+    )
+    tool_result = UserMessage(content=[ToolResultBlock(tool_use_id="t1", content="data")])
+    models = fake_query(lambda model: [_init(), tool_turn, tool_result, *_overloaded(model)[1:]])
+
+    with pytest.raises(AgentAPIError):
+        _collect(_executor())
+    assert models == [PRIMARY]
+
+
+def test_first_turn_timeout_falls_back(fake_query):
+    models = fake_query(
+        lambda model: [_init(), 1.0 if model == PRIMARY else 0, _text(model, "fast"), _result()]
+    )
+    assert _collect(_executor(timeout_ms=50)) == "fast"
+    assert models == [PRIMARY, FALLBACK]
+
+
+def test_limiter_sees_each_attempt_under_its_model(fake_query):
+    fake_query(lambda model: [_init(), 1.0 if model == PRIMARY else 0, _text(model, "fast"), _result()])
+    executor = _executor(timeout_ms=50)
+    executor.scheduler = PriorityScheduler(8)
+    executor.limiter = AdaptiveLimiter(executor.scheduler, max_limit=8)
+
+    assert _collect(executor) == "fast"
+    assert [(a["reason"], a["model"]) for a in executor.limiter.adjustments] == [("timeout", PRIMARY)]
+    assert list(executor.limiter.stats()["models"]) == [FALLBACK]
@@ -0,0 +1,143 @@
+"""Tests for the adaptive concurrency limiter."""
+
+import asyncio
+
+from app.config import settings
+from app.limiter import AdaptiveLimiter
+from app.scheduler import PriorityScheduler
+
+
+def _fill(scheduler: PriorityScheduler) -> None:
+    """Take every slot so the limit is binding."""
+
+    async def main():
+        while scheduler.in_flight < scheduler.max_concurrency:
+            await scheduler.acquire("high")
+
+    asyncio.run(main())
+
+
+def test_starting_limit_is_clamped_to_bounds():
+    scheduler = PriorityScheduler(50)
+    limiter = AdaptiveLimiter(scheduler, min_limit=2, max_limit=10)
+    assert limiter.limit == 10
+    assert scheduler.max_concurrency == 10
+
+    limiter = AdaptiveLimiter(PriorityScheduler(1), min_limit=2, max_limit=10)
+    assert limiter.limit == 2
+
+
+def test_increase_stops_at_max_limit():
+    scheduler = PriorityScheduler(2)
+    limiter = AdaptiveLimiter(scheduler, min_limit=1, max_limit=4)
+    for _ in range(100):
+        _fill(scheduler)
+        limiter.record(ttft_ms=100)
+    assert limiter.limit == 4
+    assert scheduler.max_concurrency == 4
+    assert [a["reason"] for a in limiter.adjustments] == ["increase", "increase"]
+
+
+def test_no_increase_while_limit_is_not_binding():
+    scheduler = PriorityScheduler(4)
+    limiter = AdaptiveLimiter(scheduler, max_limit=8)
+    for _ in range(100):
+        limiter.record(ttft_ms=100)
+    assert limiter.limit == 4
+
+
+def test_decrease_stops_at_min_limit():
+    scheduler = PriorityScheduler(16)
+    limiter = AdaptiveLimiter(scheduler, min_limit=3, max_limit=16, cooldown_seconds=0)
+    for _ in range(50):
+        limiter.record(error="overloaded")
+    assert limiter.limit == 3
+    assert scheduler.max_concurrency == 3
+    assert limiter.errors["overloaded"] == 50
+
+
+def test_cooldown_counts_an_error_wave_once():
+    scheduler = PriorityScheduler(16)
+    limiter = AdaptiveLimiter(scheduler, max_limit=16, cooldown_seconds=60)
+    first = limiter.record(error="rate_limited")
+    assert first is not None
+    assert (first["from_limit"], first["to_limit"], first["reason"]) == (16, 12, "rate_limited")
+
+    assert limiter.record(error="rate_limited") is None
+    assert limiter.record(error="overloaded") is None
+    assert limiter.limit == 12
+    assert limiter.errors == {"rate_limited": 2, "overloaded": 1, "timeout": 0}
+
+
+def test_latency_spike_backs_off():
+    scheduler = PriorityScheduler(8)
+    limiter = AdaptiveLimiter(scheduler, max_limit=8, latency_tolerance=2.0, cooldown_seconds=0)
+    for _ in range(20):
+        assert limiter.record(ttft_ms=500) is None
+
+    adjustment = None
+    while adjustment is None:
+        adjustment = limiter.record(ttft_ms=5000)
+    assert adjustment["reason"] == "latency"
+    assert limiter.limit < 8
+
+
+def test_baselines_are_kept_per_model():
+    scheduler = PriorityScheduler(8)
+    limiter = AdaptiveLimiter(scheduler, max_limit=8, latency_tolerance=2.0, cooldown_seconds=0)
+    for _ in range(20):
+        assert limiter.record(ttft_ms=500, model="fast") is None
+
+    # Routing shifts traffic to a slower model: not upstream queueing
+    for _ in range(20):
+        assert limiter.record(ttft_ms=5000, model="slow") is None
+    assert limiter.limit == 8
+
+    stats = limiter.stats()["models"]
+    assert stats["fast"] == {"samples": 20, "baseline_ttft_ms": 500.0, "recent_ttft_ms": 500.0}
+    assert stats["slow"]["samples"] == 20
+    assert stats["slow"]["baseline_ttft_ms"] == 5000.0
+
+    adjustment = None
+    while adjustment is None:
+        adjustment = limiter.record(ttft_ms=5000, model="fast")
+    assert (adjustment["reason"], adjustment["model"]) == ("latency", "fast")
+    assert adjustment["baseline_ttft_ms"] < 1000
+
+
+def test_first_turn_timeout_backs_off():
+    scheduler = PriorityScheduler(8)
+    limiter = AdaptiveLimiter(scheduler, max_limit=8, cooldown_seconds=0)
+    adjustment = limiter.record(error="timeout", model="sonnet")
+    assert adjustment is not None
+    assert (adjustment["to_limit"], adjustment["reason"], adjustment["model"]) == (6, "timeout", "sonnet")
+    assert limiter.errors["timeout"] == 1
+
+
+def test_other_errors_are_ignored():
+    scheduler = PriorityScheduler(8)
+    limiter = AdaptiveLimiter(scheduler, max_limit=8, cooldown_seconds=0)
+    assert limiter.record(error="invalid_request") is None
+    assert limiter.record(error=None) is None
+    assert limiter.limit == 8
+    assert limiter.samples == 0
+
+
+def _max_limit(monkeypatch, max_runs: int, adaptive_max: int, pool_size: int) -> int:
+    monkeypatch.setattr(settings, "max_concurrent_runs", max_runs)
+    monkeypatch.setattr(settings, "adaptive_max_concurrent_runs", adaptive_max)
+    monkeypatch.setattr(settings, "worker_pool_size", pool_size)
+    return AdaptiveLimiter.from_settings(PriorityScheduler.from_settings()).max_limit
+
+
+def test_from_settings_caps_at_max_concurrent_runs(monkeypatch):
+    assert _max_limit(monkeypatch, max_runs=4, adaptive_max=0, pool_size=0) == 4
+    assert _max_limit(monkeypatch, max_runs=4, adaptive_max=6, pool_size=0) == 4
+    assert _max_limit(monkeypatch, max_runs=8, adaptive_max=6, pool_size=2) == 6
+
+
+def test_from_settings_caps_at_worker_pool_size(monkeypatch):
+    assert _max_limit(monkeypatch, max_runs=0, adaptive_max=0, pool_size=3) == 3
+    assert _max_limit(monkeypatch, max_runs=0, adaptive_max=10, pool_size=3) == 3
+    assert _max_limit(monkeypatch, max_runs=0, adaptive_max=10, pool_size=0) == 10
+    assert _max_limit(monkeypatch, max_runs=0, adaptive_max=0, pool_size=0) == 32
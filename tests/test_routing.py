@@ -0,0 +1,128 @@
+"""Tests for model routing rules and error classification."""
+
+import asyncio
+
+import pytest
+
+from app.agent import AgentConfig
+from app.routing import AgentAPIError, ModelRouter, RouteRule, classify_error, parse_routes
+
+
+@pytest.mark.parametrize(
+    "message, kind",
+    [
+        ('API Error: 529 {"type":"error","error":{"type":"overloaded_error"}}', "overloaded"),
+        ("Error code: 529", "overloaded"),
+        ("upstream status code 529", "overloaded"),
+        ("overloaded_error", "overloaded"),
+        ('API Error: 429 {"type":"error","error":{"type":"rate_limit_error"}}', "rate_limited"),
+        ("Error code: 429", "rate_limited"),
+        ("processed 5290 rows", None),
+        ("used 1429 tokens", None),
+        ("found 529 items", None),
+        ("Command failed with exit code 1", None),
+    ],
+)
+def test_classify_error_messages(message, kind):
+    assert classify_error(RuntimeError(message)) == kind
+
+
+def test_classify_error_timeouts_and_kinds():
+    assert classify_error(asyncio.TimeoutError()) == "timeout"
+    assert classify_error(TimeoutError("slow")) == "timeout"
+    assert classify_error(AgentAPIError("rate_limit", "Rate limited")) == "rate_limited"
+    assert classify_error(AgentAPIError("server_error", "API Error: 500")) == "overloaded"
+    assert classify_error(AgentAPIError("invalid_request", "API Error: 400")) is None
+
+
+def _router(*rules: dict, fallback_model=None, timeout_ms=None) -> ModelRouter:
+    return ModelRouter(
+        parse_routes(list(rules), fallback_model, timeout_ms),
+        default_model="default-model",
+        fallback_model=fallback_model,
+        timeout_ms=timeout_ms,
+    )
+
+
+def test_first_matching_rule_wins():
+    router = _router(
+        {"name": "small", "max_payload_bytes": 100, "model": "small-model"},
+        {"name": "also-small", "max_payload_bytes": 1000, "model": "other-model"},
+    )
+    assert router.route(50).name == "small"
+    assert router.route(500).name == "also-small"
+    decision = router.route(5000)
+    assert (decision.name, decision.model, decision.reason) == ("default", "default-model", "no rule matched")
+
+
+def test_each_condition():
+    router = _router(
+        {"name": "big", "min_payload_bytes": 1000, "model": "m1"},
+        {"name": "fast", "max_latency_budget_ms": 5000, "model": "m2"},
+        {"name": "acme", "clients": "acme", "model": "m3"},
+    )
+    assert router.route(2000).name == "big"
+    assert router.route(10, latency_budget_ms=5000).name == "fast"
+    assert router.route(10, latency_budget_ms=5001).name == "default"
+    assert router.route(10).name == "default"
+    decision = router.route(10, client="acme")
+    assert (decision.name, decision.reason) == ("acme", "client=acme")
+    assert router.route(10, client="beta").name == "default"
+
+
+def test_conditions_combine():
+    rule = RouteRule.from_dict({"model": "m", "max_payload_bytes": 100, "clients": ["acme"]}, 0)
+    assert rule.match(50, None, "acme") == "payload_bytes=50 <= 100, client=acme"
+    assert rule.match(500, None, "acme") is None
+    assert rule.match(50, None, None) is None
+    assert RouteRule.from_dict({"model": "m"}, 0).match(10, None, None) == "unconditional"
+
+
+def test_rules_inherit_and_override_agent_fallback():
+    router = _router(
+        {"name": "a", "max_payload_bytes": 10, "model": "m"},
+        {"name": "b", "max_payload_bytes": 100, "model": "m", "fallback_model": None, "timeout_ms": 500},
+        fallback_model="fb",
+        timeout_ms=2000,
+    )
+    a, b, default = router.route(5), router.route(50), router.route(500)
+    assert (a.fallback_model, a.timeout_ms) == ("fb", 2000)
+    assert (b.fallback_model, b.timeout_ms) == (None, 500)
+    assert (default.fallback_model, default.timeout_ms) == ("fb", 2000)
+    assert router.rules[0].name == "a" and RouteRule.from_dict({"model": "m"}, 2).name == "route-3"
+
+
+@pytest.mark.parametrize(
+    "routes, message",
+    [
+        ({"model": "m"}, "'routes' must be a list"),
+        (["m"], "must be a mapping"),
+        ([{"max_payload_bytes": 10}], "must be a mapping with a 'model' key"),
+        ([{"model": "m", "api_keys": ["k"]}], "unknown keys"),
+        ([{"model": "m", "max_payload_bytes": "2k"}], "'max_payload_bytes' must be an integer"),
+        ([{"model": "m", "min_payload_bytes": -1}], "'min_payload_bytes' must be an integer"),
+        ([{"model": "m", "max_latency_budget_ms": True}], "'max_latency_budget_ms' must be an integer"),
+        ([{"model": "m", "timeout_ms": 0}], "'timeout_ms' must be an integer >= 1"),
+        ([{"model": "m", "clients": {"acme": 1}}], "'clients' must be a list"),
+        ([{"model": "m", "clients": [1]}], "'clients' entry must be a non-empty string"),
+        ([{"model": ""}], "'model' must be a non-empty string"),
+    ],
+)
+def test_invalid_routes_are_rejected(routes, message):
+    with pytest.raises(ValueError, match=message):
+        parse_routes(routes)
+
+
+def test_invalid_agent_level_settings_are_rejected():
+    with pytest.raises(ValueError, match="'timeout_ms' must be an integer"):
+        parse_routes(None, timeout_ms="20s")
+    with pytest.raises(ValueError, match="'fallback_model' must be a non-empty string"):
+        parse_routes([], fallback_model=["haiku"])
+    assert parse_routes(None) == []
+
+
+def test_agent_file_with_bad_route_fails_at_load(tmp_path):
+    path = tmp_path / "agent.md"
+    path.write_text("---\nname: a\nroutes:\n  - model: m\n    max_payload_bytes: 2k\n---\nPrompt.\n")
+    with pytest.raises(ValueError, match="max_payload_bytes"):
+        AgentConfig.from_file(path)
@@ -0,0 +1,141 @@
+"""Tests for the priority scheduler."""
+
+import asyncio
+
+import pytest
+
+from app.scheduler import PriorityScheduler
+
+
+async def _hold(scheduler: PriorityScheduler, lane: str, release: asyncio.Event, admitted: list):
+    async with scheduler.slot(lane):
+        admitted.append(lane)
+        await release.wait()
+
+
+def test_waiters_start_in_lane_order():
+    async def main():
+        scheduler = PriorityScheduler(1, reserved_interactive=0, aging_seconds=0)
+        release = asyncio.Event()
+        admitted: list[str] = []
+        holder = asyncio.create_task(_hold(scheduler, "high", release, admitted))
+        await asyncio.sleep(0)
+
+        waiters = [asyncio.create_task(scheduler.acquire(lane)) for lane in ("low", "normal", "high")]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 3
+
+        release.set()
+        await holder
+        order = []
+        for _ in range(3):
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            ticket = done.pop().result()
+            order.append(ticket.lane)
+            waiters = [w for w in waiters if not w.done()]
+            scheduler._release(ticket.lane)
+        assert order == ["high", "normal", "low"]
+
+    asyncio.run(main())
+
+
+def test_background_lane_is_kept_out_of_reserved_slots():
+    async def main():
+        scheduler = PriorityScheduler(2, reserved_interactive=1, aging_seconds=0)
+        first = await scheduler.acquire("high")
+        assert first.lane == "high"
+
+        background = asyncio.create_task(scheduler.acquire("low"))
+        await asyncio.sleep(0.01)
+        assert not background.done()
+
+        # The reserved slot still admits interactive work, ahead of the queued background run
+        second = await asyncio.wait_for(scheduler.acquire("normal"), 1)
+        assert second.lane == "normal"
+        assert scheduler.in_flight == 2
+
+        scheduler._release("high")
+        scheduler._release("normal")
+        ticket = await asyncio.wait_for(background, 1)
+        assert ticket.lane == "low"
+
+    asyncio.run(main())
+
+
+def test_aged_background_run_starts_without_another_event():
+    async def main():
+        scheduler = PriorityScheduler(2, reserved_interactive=1, aging_seconds=0.05)
+        await scheduler.acquire("high")
+
+        background = asyncio.create_task(scheduler.acquire("low"))
+        await asyncio.sleep(0.01)
+        assert not background.done()
+
+        # Nothing releases or arrives: the aging timer alone must admit it
+        ticket = await asyncio.wait_for(background, 1)
+        assert ticket.lane == "low"
+        assert ticket.wait_ms >= 50
+        assert scheduler.in_flight == 2
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = PriorityScheduler(1, reserved_interactive=0)
+        await scheduler.acquire("high")
+        waiter = asyncio.create_task(scheduler.acquire("high"))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queued == 0
+        assert scheduler.in_flight == 1
+
+    asyncio.run(main())
+
+
+def test_slot_granted_to_cancelled_waiter_is_handed_on():
+    async def main():
+        scheduler = PriorityScheduler(1, reserved_interactive=0)
+        await scheduler.acquire("high")
+        cancelled = asyncio.create_task(scheduler.acquire("high"))
+        next_up = asyncio.create_task(scheduler.acquire("normal"))
+        await asyncio.sleep(0)
+
+        # Grant the slot, then cancel the waiter before it resumes
+        scheduler._release("high")
+        assert scheduler.in_flight == 1
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+        ticket = await asyncio.wait_for(next_up, 1)
+        assert ticket.lane == "normal"
+        assert scheduler.in_flight == 1
+        assert scheduler.queued == 0
+
+    asyncio.run(main())
+
+
+def test_raising_the_limit_admits_waiters():
+    async def main():
+        scheduler = PriorityScheduler(1, reserved_interactive=0)
+        await scheduler.acquire("high")
+        waiter = asyncio.create_task(scheduler.acquire("high"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        scheduler.set_limit(2)
+        await asyncio.wait_for(waiter, 1)
+        assert scheduler.in_flight == 2
+
+    asyncio.run(main())
+
+
+def test_limit_never_drops_below_one():
+    scheduler = PriorityScheduler(4)
+    scheduler.set_limit(0)
+    assert scheduler.max_concurrency == 1
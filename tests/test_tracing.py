@@ -0,0 +1,185 @@
+"""Tests for run tracing."""
+
+from claude_agent_sdk import AssistantMessage, ResultMessage, SystemMessage, TextBlock
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.tracing import Span, Tracer, render_timeline, timeline, to_otlp, trace_id_for, tracer
+
+
+def _result(is_error: bool = False) -> ResultMessage:
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=is_error,
+        num_turns=1,
+        session_id="s",
+    )
+
+
+def _span(name, span_id, parent_id=None, start_ms=0, duration_ms=10, **attributes) -> Span:
+    start_ns = 1_000_000_000 + start_ms * 1_000_000
+    return Span(
+        name=name,
+        trace_id="t" * 32,
+        span_id=span_id,
+        parent_id=parent_id,
+        start_ns=start_ns,
+        end_ns=start_ns + duration_ms * 1_000_000,
+        attributes=attributes,
+    )
+
+
+def _spans_by_name(request_id: str) -> dict:
+    return {span.name: span for span in tracer.get_trace(trace_id_for(request_id))}
+
+
+def test_http_span_covers_streamed_body(fake_query):
+    fake_query(
+        lambda model: [
+            SystemMessage(subtype="init", data={}),
+            0.1,
+            AssistantMessage(content=[TextBlock(text="hi")], model=model),
+            0.1,
+            _result(),
+        ]
+    )
+    response = TestClient(app).post("/run/stream", json={"payload": {}})
+    assert "event: done" in response.text
+
+    spans = _spans_by_name(response.headers["X-Request-ID"])
+    http_span, run_span = spans["http.request"], spans["agent.run"]
+    assert run_span.duration_ms >= 200
+    assert http_span.end_ns >= run_span.end_ns
+    assert http_span.error is None
+
+
+def test_http_span_records_in_band_stream_error(fake_query):
+    fake_query(lambda model: [SystemMessage(subtype="init", data={}), RuntimeError("exploded")])
+    response = TestClient(app).post("/run/stream", json={"payload": {}})
+    assert response.status_code == 200
+    assert "event: error" in response.text
+
+    http_span = _spans_by_name(response.headers["X-Request-ID"])["http.request"]
+    assert http_span.attributes["status_code"] == 200
+    assert "exploded" in http_span.error
+
+
+def test_non_run_endpoints_are_not_traced():
+    before = len(tracer._traces)
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/scheduler")
+    assert len(tracer._traces) == before
+
+
+def test_timeline_orders_depth_first_by_start():
+    spans = [
+        _span("tool.call", "c2", "q", start_ms=30),
+        _span("agent.run", "r", start_ms=0, duration_ms=100),
+        _span("model.turn", "c1", "q", start_ms=10),
+        _span("agent.query", "q", "r", start_ms=5, duration_ms=90),
+        _span("scheduler.wait", "w", "r", start_ms=1, duration_ms=2),
+    ]
+    rows = timeline(spans)
+    assert [(r["name"], r["depth"]) for r in rows] == [
+        ("agent.run", 0),
+        ("scheduler.wait", 1),
+        ("agent.query", 1),
+        ("model.turn", 2),
+        ("tool.call", 2),
+    ]
+    assert rows[3]["start_offset_ms"] == 10.0
+    assert rows[3]["duration_ms"] == 10.0
+
+
+def test_timeline_makes_orphans_roots():
+    # agent.run is still running (not recorded); its children must not disappear
+    spans = [
+        _span("http.request", "h", start_ms=0, duration_ms=50),
+        _span("agent.query", "q", "missing-run", start_ms=5),
+        _span("model.turn", "m", "q", start_ms=6),
+    ]
+    rows = timeline(spans)
+    assert [(r["name"], r["depth"]) for r in rows] == [
+        ("http.request", 0),
+        ("agent.query", 0),
+        ("model.turn", 1),
+    ]
+    assert rows[1]["parent_id"] == "missing-run"
+    assert timeline([]) == []
+
+
+def test_render_timeline_draws_bars_and_marks_errors():
+    failed = _span("agent.query", "q", "r", start_ms=50, duration_ms=50)
+    failed.error = "RuntimeError: boom"
+    text = render_timeline(timeline([_span("agent.run", "r", duration_ms=100), failed]))
+
+    first, second = text.splitlines()
+    assert first.startswith("agent.run ")
+    assert second.startswith("  agent.query")
+    assert first.split("|")[1] == "█" * 48
+    assert second.split("|")[1] == " " * 24 + "█" * 24
+    assert second.endswith("+50.0ms !")
+    assert not first.endswith("!")
+    assert render_timeline([]) == ""
+
+
+def test_to_otlp_encodes_attributes_and_status():
+    ok = _span("agent.run", "r", turns=3, ratio=0.5, cached=True, model="haiku", tools=["Read"])
+    failed = _span("tool.call", "c", "r")
+    failed.error = "TimeoutError: slow"
+
+    body = to_otlp([ok, failed], "svc")
+    resource = body["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "svc"}}]
+
+    run, call = resource["scopeSpans"][0]["spans"]
+    assert {a["key"]: a["value"] for a in run["attributes"]} == {
+        "turns": {"intValue": "3"},
+        "ratio": {"doubleValue": 0.5},
+        "cached": {"boolValue": True},
+        "model": {"stringValue": "haiku"},
+        "tools": {"stringValue": '["Read"]'},
+    }
+    assert run["status"] == {"code": 1}
+    assert "parentSpanId" not in run
+    assert run["startTimeUnixNano"] == str(ok.start_ns)
+    assert call["parentSpanId"] == "r"
+    assert call["status"] == {"code": 2, "message": "TimeoutError: slow"}
+
+
+def test_tracer_evicts_oldest_traces():
+    local = Tracer(buffer_size=2)
+    for trace_id in ("a", "b", "c"):
+        with local.span("op", trace_id=trace_id):
+            pass
+    assert local.get_trace("a") == []
+    assert [s.name for s in local.get_trace("b")] == ["op"]
+    assert [s.name for s in local.get_trace("c")] == ["op"]
+
+    # More spans for a kept trace do not evict anything
+    with local.span("op2", trace_id="b"):
+        pass
+    assert len(local.get_trace("b")) == 2
+    assert local.get_trace("c")
+
+
+def test_tracer_span_records_errors_once():
+    local = Tracer()
+    try:
+        with local.span("op", trace_id="x") as span:
+            raise ValueError("bad")
+    except ValueError:
+        pass
+    local.end_span(span)  # already ended: ignored
+    assert [s.error for s in local.get_trace("x")] == ["ValueError: bad"]
+    assert local.pop_trace("x") and local.get_trace("x") == []
+
+
+def test_disabled_tracer_keeps_nothing():
+    local = Tracer(enabled=False)
+    with local.span("op", trace_id="x"):
+        pass
+    assert local.get_trace("x") == []
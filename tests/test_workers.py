@@ -0,0 +1,175 @@
+"""Tests for the worker pool, using a stub worker that never starts the CLI."""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.agent import RunProgress, agent_executor
+from app.workers import (
+    WorkerCrashedError,
+    WorkerLimits,
+    WorkerPool,
+    WorkerRunError,
+    WorkerUnavailableError,
+)
+
+
+def _stub_worker(slot, conn, agent_config, model, workdir, limits):
+    """Speak the worker pipe protocol; ``payload["mode"]`` picks the behaviour."""
+    os.chdir(workdir)
+    runs = 0
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        payload = job[0]
+        mode = payload.get("mode", "ok")
+        if mode == "crash":
+            os._exit(3)
+
+        conn.send(("progress", {"tool_calls": 1}))
+        conn.send(("chunk", str(os.getpid())))
+        if mode == "hang":
+            time.sleep(3600)
+
+        runs += 1
+        recycle = bool(limits.max_runs) and runs >= limits.max_runs
+        error = "boom" if mode == "error" else None
+        conn.send(
+            (
+                "end",
+                {
+                    "error": error,
+                    "error_type": "RuntimeError" if error else None,
+                    "kind": None,
+                    "recycle": recycle,
+                    "spans": [],
+                },
+            )
+        )
+        if recycle:
+            break
+    conn.close()
+
+
+class StubPool(WorkerPool):
+    target = staticmethod(_stub_worker)
+
+
+def _pool(base_dir, size=1, max_runs=0, acquire_timeout=30.0) -> StubPool:
+    return StubPool(
+        agent_executor,
+        size=size,
+        limits=WorkerLimits(max_runs=max_runs),
+        base_dir=base_dir,
+        acquire_timeout=acquire_timeout,
+    )
+
+
+async def _run(pool: WorkerPool, mode: str = "ok", progress=None) -> list[str]:
+    return [chunk async for chunk in pool.stream({"mode": mode}, "req", progress=progress)]
+
+
+def test_streams_chunks_and_reuses_worker(tmp_path):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.start()
+        try:
+            progress = RunProgress()
+            first = await _run(pool, progress=progress)
+            second = await _run(pool)
+            assert first == second
+            assert progress.tool_calls == 1
+            assert pool.recycled == 0
+        finally:
+            await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_worker_recycled_after_max_runs_gets_fresh_directory(tmp_path):
+    async def main():
+        pool = _pool(tmp_path, max_runs=1)
+        await pool.start()
+        try:
+            old_dir = pool._workers[0].workdir
+            first = await _run(pool)
+            second = await _run(pool)
+            assert first != second
+            assert pool.recycled == 1
+            assert not old_dir.exists()
+            assert pool._workers[0].workdir.exists()
+            assert pool._workers[0].workdir != old_dir
+        finally:
+            await pool.stop()
+        assert list(tmp_path.iterdir()) == []
+
+    asyncio.run(main())
+
+
+def test_crash_raises_and_worker_is_replaced(tmp_path):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.start()
+        try:
+            with pytest.raises(WorkerCrashedError):
+                await _run(pool, "crash")
+            assert await _run(pool)
+            assert pool.recycled == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_run_error_is_raised_and_worker_kept(tmp_path):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.start()
+        try:
+            with pytest.raises(WorkerRunError) as exc_info:
+                await _run(pool, "error")
+            assert exc_info.value.error_type == "RuntimeError"
+            assert await _run(pool)
+            assert pool.recycled == 0
+        finally:
+            await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_abandoned_stream_replaces_worker(tmp_path):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.start()
+        try:
+            stream = pool.stream({"mode": "hang"}, "req")
+            pid = await stream.__anext__()
+            process = pool._workers[0].process
+            await stream.aclose()
+
+            assert await _run(pool) != [pid]
+            assert not process.is_alive()
+            assert pool.recycled == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_no_idle_worker_raises_unavailable(tmp_path):
+    async def main():
+        pool = _pool(tmp_path, acquire_timeout=0.2)
+        await pool.start()
+        stream = pool.stream({"mode": "hang"}, "req")
+        try:
+            await stream.__anext__()
+            with pytest.raises(WorkerUnavailableError):
+                await _run(pool)
+        finally:
+            await stream.aclose()
+            await pool.stop()
+
+    asyncio.run(main())